@@ -3,7 +3,7 @@
 import copy
 import math
 import click
-from typing import List
+from typing import List, Tuple
 
 class _NotFound(Exception):
     pass
@@ -83,7 +83,161 @@ def _used_in_box(grid: Grid, row: int, col: int, num: int) -> bool:
                 return True
     return False
 
-def _solve_dot_rows(dot_rows):
+# pylint: disable=invalid-name
+_popcount = getattr(int, 'bit_count', lambda mask: bin(mask).count('1'))
+
+class Bitmasks(object):
+    '''
+    Candidate bitmasks of a grid, kept up to date as values are placed
+
+    Bit (num - 1) of a mask stands for the number num. There is one
+    mask of used numbers per row, column and box, all in 'used': row r
+    is unit r, column c is unit n + c and box b is unit 2n + b, where n
+    is the number of rows. The candidates of an empty cell are the
+    numbers used in none of its three units.
+    '''
+    def __init__(self, grid: Grid) -> None:
+        order = grid.get_order()
+        n = grid.num_rows()
+        self.full = (1 << n) - 1
+        self.used = [0] * (3 * n)
+        self.bits = [0] * (n * n)
+        self.cell_units = [(row, n + col, 2 * n + (row // order) * order + col // order)
+                           for row in range(n) for col in range(n)]
+        self.units = [[] for _ in range(3 * n)] # type: List[List[int]]
+        for cell, units in enumerate(self.cell_units):
+            for unit in units:
+                self.units[unit].append(cell)
+        self.consistent = True
+        self.nodes = 0 # calls of search, for benchmarking
+        self.empty = []
+        for cell in range(n * n):
+            num = grid.get_num(cell // n, cell % n)
+            if num == 0:
+                self.empty.append(cell)
+            elif self._candidates(cell) >> (num - 1) & 1:
+                self._place(cell, 1 << (num - 1))
+            else:
+                self.consistent = False
+
+    def _candidates(self, cell: int) -> int:
+        row, col, box = self.cell_units[cell]
+        return self.full & ~(self.used[row] | self.used[col] | self.used[box])
+
+    def _place(self, cell: int, bit: int) -> None:
+        self.bits[cell] = bit
+        for unit in self.cell_units[cell]:
+            self.used[unit] |= bit
+
+    def _unplace(self, cell: int, bit: int) -> None:
+        self.bits[cell] = 0
+        for unit in self.cell_units[cell]:
+            self.used[unit] ^= bit
+
+    def _propagate(self, trail: List[Tuple[int, int]]) -> bool:
+        # places naked and hidden singles until there are none left,
+        # recording the placements in trail; False on a contradiction
+        bits = self.bits
+        changed = True
+        while changed:
+            changed = False
+            for cell in self.empty:
+                if bits[cell]:
+                    continue
+                candidates = self._candidates(cell)
+                if candidates == 0:
+                    return False
+                if candidates & (candidates - 1) == 0:
+                    self._place(cell, candidates)
+                    trail.append((cell, candidates))
+                    changed = True
+            for unit, cells in enumerate(self.units):
+                # numbers that are candidates in at least one and in at
+                # least two of the empty cells of the unit
+                once = twice = 0
+                for cell in cells:
+                    if not bits[cell]:
+                        candidates = self._candidates(cell)
+                        twice |= once & candidates
+                        once |= candidates
+                if self.full & ~self.used[unit] & ~once:
+                    return False
+                singles = once & ~twice
+                while singles:
+                    bit = singles & -singles
+                    singles ^= bit
+                    for cell in cells:
+                        if not bits[cell] and self._candidates(cell) & bit:
+                            break
+                    else:
+                        return False
+                    self._place(cell, bit)
+                    trail.append((cell, bit))
+                    changed = True
+        return True
+
+    def _most_constrained(self) -> int:
+        # the empty cell with the fewest candidates, -1 if there is none
+        ans = -1
+        fewest = self.full.bit_length() + 1
+        for cell in self.empty:
+            if not self.bits[cell]:
+                count = _popcount(self._candidates(cell))
+                if count < fewest:
+                    ans = cell
+                    fewest = count
+                    if count <= 2:
+                        break
+        return ans
+
+    def search(self) -> bool:
+        '''
+        fills in the empty cells; True if that succeeds, False (with the
+        masks restored) if the grid has no solution
+        '''
+        self.nodes += 1
+        trail = [] # type: List[Tuple[int, int]]
+        if self._propagate(trail):
+            cell = self._most_constrained()
+            if cell < 0:
+                return True
+            candidates = self._candidates(cell)
+            while candidates:
+                bit = candidates & -candidates
+                candidates ^= bit
+                self._place(cell, bit)
+                if self.search():
+                    return True
+                self._unplace(cell, bit)
+        for cell, bit in reversed(trail):
+            self._unplace(cell, bit)
+        return False
+
+    def write(self, grid: Grid) -> None:
+        'copies the placed numbers into the grid'
+        n = grid.num_rows()
+        for cell, bit in enumerate(self.bits):
+            grid.set_num(cell // n, cell % n, bit.bit_length())
+
+def _solve_sudoku_bitmask(grid: Grid) -> bool:
+    '''
+    Solves the grid in place like _solve_sudoku, but instead of
+    rescanning the grid it keeps bitmasks of the numbers used in every
+    row, column and box, always branches on the most constrained cell
+    and fills in naked and hidden singles before each branch.
+    '''
+    masks = Bitmasks(grid)
+    if not masks.consistent or not masks.search():
+        return False
+    masks.write(grid)
+    return True
+
+ENGINES = {
+    'naive': _solve_sudoku,
+    'bitmask': _solve_sudoku_bitmask,
+}
+
+def _solve_dot_rows(dot_rows, engine='bitmask'):
     from sudoku import _dot_rows_to_zero_rows, _get_chars_ex
     from drawsudoku import draw_sudoku
 
@@ -103,7 +257,7 @@ def _solve_dot_rows(dot_rows):
     else:
         raise NotImplementedError
 
-    if _solve_sudoku(grid):
+    if ENGINES[engine](grid):
         for i, row in enumerate(zero_rows):
             for j, z in enumerate(row):
                 if z != 0:
@@ -112,20 +266,22 @@ def _solve_dot_rows(dot_rows):
     else:
         print("no solution")
 
-def work(path: str, puzzle: int) -> None:
+def work(path: str, puzzle: int, engine: str = 'bitmask') -> None:
     'Loads puzzles from a YAML file and solve the puzzle of your choice'
     import yaml
     with open(path, 'r') as fobj:
-        ans = yaml.load(fobj)
+        ans = yaml.safe_load(fobj)
     dot_rows = ans[puzzle]['dot_rows']
-    _solve_dot_rows(dot_rows=dot_rows)
+    _solve_dot_rows(dot_rows=dot_rows, engine=engine)
 
 @click.command()
 @click.option("--path", type=str, help='path to input yaml file', prompt=True)
 @click.option("--puzzle", type=int, help='zero based puzzle number', prompt=True)
-def main(path: str, puzzle: int) -> None:
+@click.option("--engine", type=click.Choice(sorted(ENGINES)), default='bitmask',
+              help='backtracking engine')
+def main(path: str, puzzle: int, engine: str) -> None:
     'main entry point'
-    work(path, puzzle)
+    work(path, puzzle, engine)
 
 if __name__ == '__main__':
     # main() # pylint: disable=no-value-for-parameter
@@ -0,0 +1,360 @@
+'''
+bench.py
+
+Benchmarks the Sudoku solvers without drawing anything.
+
+Every engine is run over puzzles.yaml and input.yaml (order6.yaml, whose
+searches are far too slow for a routine run, only with --corpus) and
+over randomly generated boards of orders 2 .. 6. For each corpus and engine
+the benchmark reports
+
+    setup time      building the engine's state for the puzzles,
+                    including the exact cover templates, which are
+                    rebuilt for every run
+    search time     finding the first solution of each puzzle
+    nodes           search nodes visited, where the engine counts them
+                    (dlx.SearchStats for the exact cover engines)
+    peak memory     with --memory, the tracemalloc peak of a second,
+                    untimed pass without the puzzles that ran out of
+                    time; tracing makes it several times slower than
+                    the timed one, so it is left out by default
+    puzzles/sec     all the puzzles of the corpus / (setup time +
+                    search time + the timeout for every puzzle that
+                    ran out of it), so timeouts lower the rate
+
+The results can be written as JSON and compared with the JSON of an
+earlier run, e.g.
+
+    python bench.py --output baseline.json
+    ... change the solvers ...
+    python bench.py --baseline baseline.json
+
+which exits with status 1 when an engine got slower on a corpus by
+more than the tolerance, or ran out of time on more of its puzzles.
+'''
+
+import copy
+import functools
+import json
+import math
+import random
+import signal
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import click
+import backtrack
+import dlx
+import logic
+import sudoku
+from generate import shuffled_lines
+
+Puzzle = List[List[int]]                    # pylint: disable=invalid-name
+Result = Dict[str, Any]                     # pylint: disable=invalid-name
+
+# order6.yaml is left out: its searches are far too slow for a routine run,
+# so it only runs when asked for with --corpus
+DEFAULT_CORPORA = ('puzzles.yaml', 'input.yaml')
+
+# seconds allowed per puzzle unless --timeout is given; the naive
+# backtracker takes far longer than that on the hard puzzles of the
+# corpora, so it gets less time to find that out
+DEFAULT_TIMEOUT = 5.0
+ENGINE_TIMEOUTS = {'backtrack': 1.0}
+
+class _Timeout(Exception):
+    'Exception thrown when a puzzle runs out of time'
+
+def _order(zero_rows: Puzzle) -> int:
+    return int(math.sqrt(len(zero_rows)))
+
+def _search_dlx(root: Any, heuristic: str = 'min') -> Optional[int]:
+    if root is None:
+        return None
+    stats = dlx.SearchStats()
+    root.search(None, stats=stats, max_solutions=1, heuristic=heuristic, seed=0)
+    return sum(stats.nodes)
+
+# set_bits of each order for the linked engine, which has no template
+_SET_BITS = {} # type: Dict[int, List[List[int]]]
+
+def _setup_links(zero_rows: Puzzle) -> Optional[dlx.Root]:
+    order = _order(zero_rows)
+    puzzle = sudoku.Sudoku(order, zero_rows)
+    if order not in _SET_BITS:
+        _SET_BITS[order] = puzzle.get_set_bits()
+    root = dlx.Root(list(range(puzzle.n_dlx_columns)), _SET_BITS[order])
+    try:
+        root.select_rows(puzzle.get_clue_rows(zero_rows))
+    except dlx.ConflictError:
+        return None
+    return root
+
+def _search_links(root: Optional[dlx.Root]) -> Optional[int]:
+    if root is None:
+        return None
+    stats = dlx.SearchStats()
+    root.search(None, iterative=True, stats=stats, max_solutions=1)
+    return sum(stats.nodes)
+
+def _setup_array(zero_rows: Puzzle) -> Optional[dlx.ArrayRoot]:
+    order = _order(zero_rows)
+    puzzle = sudoku.Sudoku(order, zero_rows)
+    root = sudoku.get_template(order).copy()
+    try:
+        root.select_rows(puzzle.get_clue_rows(zero_rows))
+    except dlx.ConflictError:
+        return None
+    return root
+
+def _setup_pruned(zero_rows: Puzzle) -> Optional[dlx.ArrayRoot]:
+    puzzle = sudoku.Sudoku(_order(zero_rows), zero_rows)
+    try:
+        return puzzle.get_pruned_root(zero_rows)
+    except dlx.ConflictError:
+        return None
+
+def _setup_bitset(zero_rows: Puzzle) -> Optional[dlx.BitsetRoot]:
+    puzzle = sudoku.Sudoku(_order(zero_rows), zero_rows)
+    try:
+        return puzzle.get_pruned_root(zero_rows, engine='bitset')
+    except dlx.ConflictError:
+        return None
+
+def _setup_deduce(zero_rows: Puzzle) -> Optional[dlx.ArrayRoot]:
+    # deduction counts as setup; nothing is left to search when it
+    # solves the puzzle or finds it has no solution
+    try:
+        zero_rows = logic.deduce(zero_rows)[0]
+    except logic.Contradiction:
+        return None
+    if logic.is_complete(zero_rows):
+        return None
+    return _setup_pruned(zero_rows)
+
+def _setup_grid(zero_rows: Puzzle) -> backtrack.Grid:
+    return backtrack.Grid(copy.deepcopy(zero_rows))
+
+def _search_naive(grid: backtrack.Grid) -> Optional[int]:
+    backtrack.ENGINES['naive'](grid)
+    return None
+
+def _setup_bitmask(zero_rows: Puzzle) -> Any:
+    return backtrack.Bitmasks(_setup_grid(zero_rows))
+
+def _search_bitmask(masks: Any) -> Optional[int]:
+    if masks.consistent:
+        masks.search()
+    return masks.nodes
+
+# name: (highest order the engine is practical for, setup, search)
+ENGINES = {
+    'dlx-links': (6, _setup_links, _search_links),
+    'dlx-array': (6, _setup_array, _search_dlx),
+    'dlx-pruned': (6, _setup_pruned, _search_dlx),
+    'dlx-early': (6, _setup_pruned, functools.partial(_search_dlx, heuristic='early')),
+    'dlx-random': (6, _setup_pruned, functools.partial(_search_dlx, heuristic='random')),
+    'dlx-buckets': (6, _setup_pruned, functools.partial(_search_dlx, heuristic='buckets')),
+    'dlx-bitset': (6, _setup_bitset, _search_dlx),
+    'dlx-deduce': (6, _setup_deduce, _search_dlx),
+    'backtrack': (3, _setup_grid, _search_naive),
+    'backtrack-bitmask': (6, _setup_bitmask, _search_bitmask),
+} # type: Dict[str, Tuple[int, Callable[[Puzzle], Any], Callable[[Any], Optional[int]]]]
+
+def _clear_caches() -> None:
+    sudoku.clear_caches()
+    _SET_BITS.clear()
+    logic.clear_caches()
+
+def _on_alarm(*_) -> None:
+    raise _Timeout()
+
+def _run_one(setup: Callable, search: Callable, zero_rows: Puzzle,
+             timeout: float) -> Tuple[float, float, Optional[int]]:
+    # times the setup and search of one puzzle; raises _Timeout when
+    # they take longer than timeout seconds (where the OS supports it)
+    use_alarm = timeout > 0 and hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        start = time.perf_counter()
+        state = setup(zero_rows)
+        middle = time.perf_counter()
+        nodes = search(state)
+        end = time.perf_counter()
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return middle - start, end - middle, nodes
+
+def run(corpus: str,
+        puzzles: List[Puzzle],
+        engine: str,
+        timeout: float = 0.0,
+        memory: bool = True) -> Result:
+    'runs one engine over one corpus and returns its measurements'
+    max_order, setup, search = ENGINES[engine]
+    puzzles = [p for p in puzzles if _order(p) <= max_order]
+    setup_seconds = search_seconds = 0.0
+    nodes = None # type: Optional[int]
+    finished = [] # type: List[Puzzle]
+    _clear_caches()
+    for zero_rows in puzzles:
+        try:
+            setup_time, search_time, count = _run_one(setup, search,
+                                                      zero_rows, timeout)
+        except _Timeout:
+            continue
+        finished.append(zero_rows)
+        setup_seconds += setup_time
+        search_seconds += search_time
+        if count is not None:
+            nodes = (nodes or 0) + count
+    peak = None # type: Optional[int]
+    if memory:
+        # the puzzles that ran out of time would only do so again
+        _clear_caches()
+        tracemalloc.start()
+        for zero_rows in finished:
+            try:
+                _run_one(setup, search, zero_rows, timeout)
+            except _Timeout:
+                pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    timeouts = len(puzzles) - len(finished)
+    elapsed = setup_seconds + search_seconds + timeouts * timeout
+    return {
+        'corpus': corpus,
+        'engine': engine,
+        'puzzles': len(finished),
+        'timeouts': timeouts,
+        'setup_seconds': setup_seconds,
+        'search_seconds': search_seconds,
+        'nodes': nodes,
+        'peak_memory_bytes': peak,
+        'puzzles_per_second': len(puzzles) / elapsed if elapsed > 0 else None,
+    }
+
+def load_corpus(path: str) -> List[Puzzle]:
+    'the puzzles of a file in the zero row representation, see sudoku.iter_puzzles'
+    return list(sudoku.iter_puzzles(path))
+
+def generate(order: int, count: int, clues: float, seed: int) -> List[Puzzle]:
+    '''
+    Random boards of the given order: a solution of the empty board is
+    shuffled by relabeling the values and permuting bands, stacks and
+    the rows and columns within them, and then only a fraction 'clues'
+    of its cells is kept. The boards are solvable but need not have a
+    unique solution.
+    '''
+    rng = random.Random('%d-%d' % (seed, order))
+    n2 = order * order
+    base = sudoku.solve([[0] * n2 for _ in range(n2)])[0]
+    ans = []
+    for _ in range(count):
+        labels = list(range(1, n2 + 1))
+        rng.shuffle(labels)
+        rows = shuffled_lines(order, rng)
+        cols = shuffled_lines(order, rng)
+        puzzle = [[labels[base[r][c] - 1] if rng.random() < clues else 0
+                   for c in cols] for r in rows]
+        ans.append(puzzle)
+    return ans
+
+def compare(results: List[Result],
+            baseline: List[Result],
+            tolerance: float) -> List[str]:
+    '''
+    Returns a description of each corpus and engine that ran out of time
+    on more puzzles than in the baseline, or whose throughput dropped by
+    more than the tolerance (0.2 = 20%) against it
+    '''
+    before = {(r['corpus'], r['engine']): r for r in baseline}
+    ans = []
+    for result in results:
+        old = before.get((result['corpus'], result['engine']))
+        if old is None:
+            continue
+        if result['timeouts'] > old['timeouts']:
+            ans.append('%s on %s: %d puzzles ran out of time, baseline %d'
+                       % (result['engine'], result['corpus'], result['timeouts'],
+                          old['timeouts']))
+        if not old['puzzles_per_second']:
+            continue
+        new_rate = result['puzzles_per_second'] or 0.0
+        ratio = new_rate / old['puzzles_per_second']
+        if ratio < 1.0 - tolerance:
+            ans.append('%s on %s: %.1f puzzles/sec, baseline %.1f (%.0f%%)'
+                       % (result['engine'], result['corpus'], new_rate,
+                          old['puzzles_per_second'], 100.0 * ratio))
+    return ans
+
+def _format(result: Result) -> str:
+    def number(value: Any, fmt: str) -> str:
+        return '-' if value is None else fmt % value
+    return '%-16s %-18s %6d %5d %9.3f %9.3f %10s %9s %10s' % (
+        result['corpus'], result['engine'], result['puzzles'],
+        result['timeouts'], result['setup_seconds'],
+        result['search_seconds'], number(result['nodes'], '%d'),
+        number(result['peak_memory_bytes'] and
+               result['peak_memory_bytes'] / 1e6, '%.1f'),
+        number(result['puzzles_per_second'], '%.1f'))
+
+@click.command()
+@click.option("--corpus", "corpora", type=str, multiple=True,
+              help='puzzle file in any format of sudoku.py --path, may be repeated '
+                   '(default: %s)' % ', '.join(DEFAULT_CORPORA))
+@click.option("--generate", "orders", type=click.IntRange(2, 6),
+              multiple=True, default=(2, 3, 4, 5, 6), show_default=True,
+              help='order of generated boards, may be repeated')
+@click.option("--count", type=int, default=10, show_default=True,
+              help='generated boards per order')
+@click.option("--clues", type=float, default=0.6, show_default=True,
+              help='fraction of the cells given in generated boards')
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--engine", "engines", type=click.Choice(sorted(ENGINES)),
+              multiple=True, help='engine to run, may be repeated (default: all)')
+@click.option("--timeout", type=float,
+              help='seconds allowed per puzzle, 0 for no limit (default: %g, %s)'
+                   % (DEFAULT_TIMEOUT, ', '.join('%g for %s' % (seconds, engine) for
+                                                 engine, seconds in ENGINE_TIMEOUTS.items())))
+@click.option("--memory/--no-memory", default=False,
+              help='measure the peak memory in a second pass, which takes far '
+                   'longer than the timed one')
+@click.option("--output", type=str, help='write the results to this JSON file')
+@click.option("--baseline", type=str, help='JSON results of an earlier run to compare with')
+@click.option("--tolerance", type=float, default=0.2, show_default=True,
+              help='throughput drop that counts as a regression')
+def main(corpora, orders, count, clues, seed, engines, timeout, memory, # pylint: disable=too-many-arguments, too-many-locals
+         output, baseline, tolerance) -> None:
+    'main entry point'
+    inputs = [(path, load_corpus(path)) for path in corpora or DEFAULT_CORPORA]
+    inputs.extend(('generated-%d' % order, generate(order, count, clues, seed))
+                  for order in orders)
+    click.echo('%-16s %-18s %6s %5s %9s %9s %10s %9s %10s' % (
+        'corpus', 'engine', 'done', 't/o', 'setup s', 'search s',
+        'nodes', 'peak MB', 'puzzles/s'))
+    results = []
+    for corpus, puzzles in inputs:
+        for engine in engines or sorted(ENGINES):
+            engine_timeout = (timeout if timeout is not None
+                              else ENGINE_TIMEOUTS.get(engine, DEFAULT_TIMEOUT))
+            result = run(corpus, puzzles, engine, engine_timeout, memory)
+            results.append(result)
+            click.echo(_format(result))
+    if output:
+        with open(output, 'w') as fobj:
+            json.dump(results, fobj, indent=2)
+    if baseline:
+        with open(baseline, 'r') as fobj:
+            regressions = compare(results, json.load(fobj), tolerance)
+        for regression in regressions:
+            click.echo('REGRESSION ' + regression)
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    # pylint: disable=no-value-for-parameter
+    main()
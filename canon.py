@@ -0,0 +1,332 @@
+'''
+canon.py
+
+Canonical forms of Sudoku puzzles and a solution cache keyed by them.
+
+Two puzzles are equivalent when one turns into the other by relabeling
+the values, permuting the bands, the stacks, the rows within a band and
+the columns within a stack, and transposing the grid. Equivalent
+puzzles have equivalent solutions, so a puzzle's solution can be looked
+up under its canonical form, the same for the whole equivalence class,
+and mapped back through the transform that took the puzzle there.
+
+The canonical form is the least (compared cell by cell, row after row,
+with 0 before every value) of the puzzles that the transforms in a
+candidate set produce, each relabeled in the order its values first
+appear. Searching all the transforms is out of the question (there are
+2 * 6^8 geometric ones alone for 9 x 9 puzzles), so the candidates are
+cut down first: every row and column gets a key that no transform
+changes, built from how often the values in it occur in the puzzle and
+from the keys of the lines it crosses, and the candidates only put the
+bands, rows, stacks and columns in the order of their keys, trying
+every order of the lines whose keys are equal. Since the keys are
+invariant, equivalent puzzles have the same candidates (up to the
+transform between them) and the same canonical form.
+
+Very symmetric puzzles, the empty one above all, leave many lines with
+equal keys. When that would mean more than MAX_CANDIDATES candidates
+the puzzle has no canonical form here (canonical_form returns None) and
+the cache only finds it when it comes back exactly as it was.
+'''
+
+import collections
+import itertools
+import json
+import math
+import os
+from typing import Any, List, Optional, Tuple
+import dlx
+import sudoku
+
+Puzzle = List[List[int]]                    # pylint: disable=invalid-name
+
+MAX_CANDIDATES = 2000
+
+class Transform(object):
+    '''
+    A transform of the grid: the rows of the canonical puzzle are rows
+    'rows' of the (transposed if 'transposed') original, its columns
+    columns 'cols', and value v of the original is value labels[v] in
+    the canonical puzzle
+    '''
+    def __init__(self,
+                 transposed: bool,
+                 rows: List[int],
+                 cols: List[int],
+                 labels: List[int]) -> None:
+        self.transposed = transposed
+        self.rows = rows
+        self.cols = cols
+        self.labels = labels
+
+    def apply(self, grid: Puzzle) -> Puzzle:
+        'the grid (a puzzle or a solution) in canonical coordinates'
+        if self.transposed:
+            grid = [list(col) for col in zip(*grid)]
+        labels = self.labels
+        return [[labels[grid[row][col]] for col in self.cols] for row in self.rows]
+
+    def invert(self, grid: Puzzle) -> Puzzle:
+        'the inverse of apply, for the solutions of a canonical puzzle'
+        values = [0] * len(self.labels)
+        for value, label in enumerate(self.labels):
+            values[label] = value
+        n2 = len(grid)
+        ans = [[0] * n2 for _ in range(n2)]
+        for i, row in enumerate(self.rows):
+            for j, col in enumerate(self.cols):
+                ans[row][col] = values[grid[i][j]]
+        if self.transposed:
+            ans = [list(col) for col in zip(*ans)]
+        return ans
+
+def _ranks(keys: List[Any]) -> List[int]:
+    # the keys replaced by their rank among the distinct keys
+    index = {key: i for i, key in enumerate(sorted(set(keys)))}
+    return [index[key] for key in keys]
+
+def _line_keys(zero_rows: Puzzle, order: int) -> Tuple[List[int], List[int]]:
+    '''
+    invariant keys of the rows and of the columns of a puzzle, as ranks,
+    so that a row key of the transposed puzzle is a column key of this
+    one and the other way round
+    '''
+    n2 = order * order
+    clues = [(row, col, value) for row, values in enumerate(zero_rows)
+             for col, value in enumerate(values) if value]
+    frequency = collections.Counter(value for _, _, value in clues)
+    box_of = lambda row, col: (row // order) * order + col // order
+    row_cells = [[] for _ in range(n2)] # type: List[List[Tuple[int, int, int]]]
+    col_cells = [[] for _ in range(n2)] # type: List[List[Tuple[int, int, int]]]
+    box_cells = [[] for _ in range(n2)] # type: List[List[int]]
+    for row, col, value in clues:
+        row_cells[row].append((row, col, value))
+        col_cells[col].append((row, col, value))
+        box_cells[box_of(row, col)].append(frequency[value])
+    box_keys = _ranks([tuple(sorted(cells)) for cells in box_cells])
+    row_keys = _ranks([tuple(sorted(frequency[value] for _, _, value in cells))
+                       for cells in row_cells])
+    col_keys = _ranks([tuple(sorted(frequency[value] for _, _, value in cells))
+                       for cells in col_cells])
+    # two rounds of refinement by the keys of the lines and boxes crossed
+    for _ in range(2):
+        row_keys, col_keys = (
+            _ranks([(row_keys[i], tuple(sorted(
+                (col_keys[col], box_keys[box_of(row, col)], frequency[value])
+                for row, col, value in cells))) for i, cells in enumerate(row_cells)]),
+            _ranks([(col_keys[i], tuple(sorted(
+                (row_keys[row], box_keys[box_of(row, col)], frequency[value])
+                for row, col, value in cells))) for i, cells in enumerate(col_cells)]))
+    return row_keys, col_keys
+
+def _line_orders(keys: List[int], order: int) -> Tuple[Any, List[List[int]]]:
+    '''
+    the profile of the lines (rows or columns) with the given keys, the
+    same for equivalent puzzles, and the groups of lines to try every
+    order of: bands sorted by their lines' keys, and within a band the
+    lines sorted by key, where equal keys make a group
+    '''
+    bands = []
+    for band in range(order):
+        lines = sorted(range(band * order, (band + 1) * order), key=lambda line: keys[line])
+        bands.append((tuple(keys[line] for line in lines), lines))
+    bands.sort(key=lambda band: band[0])
+    profile = tuple(key for key, _ in bands)
+    return profile, bands
+
+def _orders(bands: List[Tuple[Any, List[int]]]) -> Tuple[int, Any]:
+    '''
+    the number of line orders that the sorted bands allow, and an
+    iterator over them: equal bands in any order, and within a band
+    equal lines in any order
+    '''
+    def tie_groups(keys: List[Any]) -> List[List[int]]:
+        # the runs of equal keys, as lists of positions
+        return [[i for i, _ in group] for _, group
+                in itertools.groupby(enumerate(keys), key=lambda item: item[1])]
+    band_groups = tie_groups([key for key, _ in bands])
+    line_groups = [tie_groups(key) for key, _ in bands]
+    count = 1
+    for group in band_groups:
+        count *= math.factorial(len(group))
+    for groups in line_groups:
+        for group in groups:
+            count *= math.factorial(len(group))
+
+    def generate():
+        band_choices = itertools.product(*(itertools.permutations(group)
+                                           for group in band_groups))
+        for band_order in band_choices:
+            band_sequence = [i for group in band_order for i in group]
+            line_choices = [list(itertools.product(*(itertools.permutations(
+                [bands[i][1][j] for j in group]) for group in line_groups[i])))
+                            for i in band_sequence]
+            for lines in itertools.product(*line_choices):
+                yield [line for band in lines for group in band for line in group]
+    return count, generate()
+
+def _relabeled(grid: Puzzle, rows: List[int], cols: List[int],
+               n2: int) -> Tuple[List[int], List[int]]:
+    # the cells in the order of rows and cols, relabeled in the order
+    # the values first appear, and the labels
+    labels = [0] * (n2 + 1)
+    next_label = 1
+    cells = []
+    for row in rows:
+        values = grid[row]
+        for col in cols:
+            value = values[col]
+            if value and not labels[value]:
+                labels[value] = next_label
+                next_label += 1
+            cells.append(labels[value])
+    # the values that do not appear take the labels left, in any order
+    for value in range(1, n2 + 1):
+        if not labels[value]:
+            labels[value] = next_label
+            next_label += 1
+    return cells, labels
+
+def canonical_form(zero_rows: Puzzle) -> Optional[Tuple[Puzzle, Transform]]:
+    '''
+    The canonical form of a puzzle, see the module description, and a
+    transform that turns the puzzle into it; None for a puzzle with
+    more candidate transforms than MAX_CANDIDATES
+    '''
+    n2 = len(zero_rows)
+    order = int(math.sqrt(n2))
+    row_keys, col_keys = _line_keys(zero_rows, order)
+    row_profile, row_bands = _line_orders(row_keys, order)
+    col_profile, col_bands = _line_orders(col_keys, order)
+    transposed = [list(col) for col in zip(*zero_rows)]
+    # the orientation with the smaller profiles first, both on a tie
+    orientations = []
+    if (row_profile, col_profile) <= (col_profile, row_profile):
+        orientations.append((False, zero_rows, row_bands, col_bands))
+    if (col_profile, row_profile) <= (row_profile, col_profile):
+        orientations.append((True, transposed, col_bands, row_bands))
+    candidates = []
+    total = 0
+    for is_transposed, grid, bands_down, bands_across in orientations:
+        n_rows, row_orders = _orders(bands_down)
+        n_cols, col_orders = _orders(bands_across)
+        total += n_rows * n_cols
+        candidates.append((is_transposed, grid, row_orders, col_orders))
+    if total > MAX_CANDIDATES:
+        return None
+    best = None # type: Optional[Tuple[List[int], Transform]]
+    for is_transposed, grid, row_orders, col_orders in candidates:
+        col_orders = list(col_orders)
+        for rows in row_orders:
+            for cols in col_orders:
+                cells, labels = _relabeled(grid, rows, cols, n2)
+                if best is None or cells < best[0]:
+                    best = (cells, Transform(is_transposed, rows, cols, labels))
+    cells, transform = best
+    return [cells[i:i + n2] for i in range(0, n2 * n2, n2)], transform
+
+class SolutionCache(object):
+    '''
+    A bounded cache of solutions in front of the solver
+
+    Solutions are kept in canonical coordinates under the canonical form
+    of their puzzle, so a puzzle equivalent to one solved before is
+    answered by mapping the stored solutions back through its transform,
+    without a search. The transforms of the puzzles seen are remembered
+    as well, so a puzzle that comes back exactly as it was is not even
+    canonicalized again. Both are least recently used caches of at most
+    maxsize entries.
+
+    With a path the solutions are loaded from that file, if it exists,
+    and save() writes them back, one JSON object per line, oldest first.
+    '''
+    def __init__(self, maxsize: int = 100000, path: Optional[str] = None) -> None:
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.canonical_hits = 0
+        self.misses = 0
+        # canonical line: (max_solutions of the search, solution lines)
+        self._solutions = collections.OrderedDict() # type: collections.OrderedDict
+        # puzzle line: (canonical line, Transform) or None
+        self._transforms = collections.OrderedDict() # type: collections.OrderedDict
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._solutions)
+
+    def load(self, path: str) -> None:
+        'adds the solutions saved in a file'
+        with open(path, 'r') as fobj:
+            for line in fobj:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._store(entry['key'], entry['max_solutions'], entry['solutions'])
+
+    def save(self, path: Optional[str] = None) -> None:
+        'writes the solutions to path, by default the one they were loaded from'
+        path = path or self.path
+        if path is None:
+            raise ValueError('the cache has no path to save to')
+        with open(path + '.tmp', 'w') as fobj:
+            for key, (max_solutions, solutions) in self._solutions.items():
+                fobj.write(json.dumps({'key': key, 'max_solutions': max_solutions,
+                                       'solutions': solutions}) + '\n')
+        os.replace(path + '.tmp', path)
+
+    def _store(self, key: str, max_solutions: int, solutions: List[str]) -> None:
+        self._solutions[key] = (max_solutions, solutions)
+        self._solutions.move_to_end(key)
+        if len(self._solutions) > self.maxsize:
+            self._solutions.popitem(last=False)
+
+    def _get_transform(self, line: str, zero_rows: Puzzle) -> Any:
+        if line in self._transforms:
+            self._transforms.move_to_end(line)
+            return self._transforms[line]
+        form = canonical_form(zero_rows)
+        if form is None:
+            # no canonical form: the puzzle is its own key
+            ans = None
+        else:
+            ans = (sudoku.zero_rows_to_line(form[0]), form[1])
+        self._transforms[line] = ans
+        if len(self._transforms) > self.maxsize:
+            self._transforms.popitem(last=False)
+        return ans
+
+    def solve(self,
+              zero_rows: Puzzle,
+              max_solutions: int = 1,
+              stats: Optional[dlx.SearchStats] = None,
+              engine: str = 'array',
+              deduce: bool = False) -> List[Puzzle]:
+        '''
+        sudoku.solve through the cache: a stored answer is used if it was
+        searched for at least max_solutions solutions or found them all.
+        The puzzle is looked up as given; with deduce=True only a puzzle
+        that is not found is deduced before it is searched
+        '''
+        line = sudoku.zero_rows_to_line(zero_rows)
+        seen = line in self._transforms
+        canonical = self._get_transform(line, zero_rows)
+        key, transform = canonical if canonical is not None else (line, None)
+        entry = self._solutions.get(key)
+        if entry is not None and (entry[0] == 0 or len(entry[1]) < entry[0]
+                                  or 0 < max_solutions <= entry[0]):
+            self._solutions.move_to_end(key)
+            solutions = [sudoku.line_to_zero_rows(solution) for solution in entry[1]]
+            if transform is not None:
+                solutions = [transform.invert(solution) for solution in solutions]
+            self.hits += 1
+            self.canonical_hits += not seen
+            return solutions[:max_solutions] if max_solutions else solutions
+        self.misses += 1
+        solutions = sudoku.solve(zero_rows, max_solutions, stats, engine, deduce)
+        stored = solutions
+        if transform is not None:
+            stored = [transform.apply(solution) for solution in solutions]
+        self._store(key, max_solutions,
+                    [sudoku.zero_rows_to_line(solution) for solution in stored])
+        return solutions
@@ -10,11 +10,142 @@ Donald E. Knuth: https://arxiv.org/abs/cs/0011047
 
 '''
 
-from typing import Any, List, Iterator, Callable, cast
+import random
+import time
+from array import array
+from typing import Any, Dict, List, Iterator, Callable, Optional, Set, Tuple, cast
 COLUMN_NAME = Any
 BROADCASTER = Callable[[Iterator[List[COLUMN_NAME]]], None]
 MAX_OHS_COUNT = 1000
 
+# the ways the searches can choose the column to branch on; all but
+# 'early' take a column with the fewest rows, they differ in how it is
+# found and in which one is taken when several have that many
+#
+#   min         the first one, found by a scan of every column left
+#   early       a shorter scan, which stops at the first column of 0 or
+#               1 rows; a 1-row column before a 0-row one is taken, so
+#               a dead end is found a level later and the search can
+#               expand more nodes than 'min' (1713 against 1379 on
+#               puzzle 9 of input.yaml) for the columns not scanned
+#   random      one picked at random, so that reruns with other seeds
+#               take different paths through the tree
+#   buckets     the first one, found without a scan from sets of the
+#               columns of each size that cover and uncover keep up
+#               to date; ArrayRoot and BitsetRoot only
+HEURISTICS = ('min', 'early', 'random', 'buckets')
+
+class ConflictError(Exception):
+    'Exception thrown when a selected row clashes with the rows already selected'
+    def __init__(self, row: int) -> None:
+        Exception.__init__(self, 'row %d uses a column that is already covered '
+                                 'or taken by an earlier row' % row)
+        self.row = row
+
+class SearchStats(object): # pylint: disable=too-many-instance-attributes
+    '''
+    Counters of a search, filled in when one is passed to Root.search,
+    ArrayRoot.search or BitsetRoot.search
+
+        nodes           the number of nodes visited at each depth, where
+                        the depth is the number of rows chosen so far
+        branching       how often _choose picked a column of each size;
+                        the size is the branching factor of the node
+                        and size 0 is a dead end
+        covers          column covers, those of the chosen column of a
+                        node and those of the other columns of its rows
+        uncovers        column uncovers
+        backtracks      rows taken back out of the partial solution
+                        without any solution found below them, i.e.
+                        the rows that led to dead ends only
+        dead_ends       nodes whose chosen column has no rows left
+        solutions       solutions found
+        first_solution  seconds from the start of the search to the
+                        first solution, None until there is one
+        elapsed         seconds spent searching
+
+    The search only checks whether it has been given a SearchStats once
+    per node and once per row it tries, never inside cover and uncover,
+    so a search without one runs as fast as before.
+    '''
+    def __init__(self) -> None:
+        self.nodes = [] # type: List[int]
+        self.branching = {} # type: Dict[int, int]
+        self.covers = 0
+        self.uncovers = 0
+        self.backtracks = 0
+        self.solutions = 0
+        self.first_solution = None # type: Optional[float]
+        self.elapsed = 0.0
+        self._started = 0.0
+        # the solutions found before each row of the partial solution
+        self._marks = [] # type: List[int]
+
+    @property
+    def dead_ends(self) -> int:
+        'the nodes whose chosen column had no rows'
+        return self.branching.get(0, 0)
+
+    def start(self) -> None:
+        'called by the search when it starts'
+        self._started = time.perf_counter()
+        self._marks = []
+
+    def stop(self) -> None:
+        'called by the search when it returns or is stopped by its callback'
+        self.elapsed += time.perf_counter() - self._started
+
+    def _visit(self, depth: int) -> None:
+        while len(self.nodes) <= depth:
+            self.nodes.append(0)
+        self.nodes[depth] += 1
+
+    def choose(self, depth: int, size: int) -> None:
+        'a node at depth chose (and covered) a column of the given size'
+        self._visit(depth)
+        self.branching[size] = self.branching.get(size, 0) + 1
+        self.covers += 1
+
+    def solution(self, depth: int) -> None:
+        'a node at depth has no columns left'
+        self._visit(depth)
+        self.solutions += 1
+        if self.first_solution is None:
+            self.first_solution = time.perf_counter() - self._started
+
+    def select(self, n_other: int) -> None:
+        'a row was added to the partial solution, covering n_other more columns'
+        self.covers += n_other
+        self._marks.append(self.solutions)
+
+    def unselect(self, n_other: int) -> None:
+        'the last row added to the partial solution was taken back'
+        self.uncovers += n_other
+        if self._marks and self._marks.pop() == self.solutions:
+            self.backtracks += 1
+
+    def leave(self) -> None:
+        'every row of the chosen column has been tried'
+        self.uncovers += 1
+
+    def summary(self) -> str:
+        'the counters on one line'
+        return ('%d nodes, depth %d, %d backtracks, %d dead ends, %d covers, '
+                '%d uncovers, %d solutions, first after %s, %.3f s'
+                % (sum(self.nodes), len(self.nodes) - 1, self.backtracks,
+                   self.dead_ends, self.covers, self.uncovers, self.solutions,
+                   '-' if self.first_solution is None
+                   else '%.3f s' % self.first_solution,
+                   self.elapsed))
+
+    def report(self) -> str:
+        'the counters with the nodes per depth and the branching factors'
+        lines = [self.summary(), 'depth  nodes']
+        lines.extend('%5d %6d' % item for item in enumerate(self.nodes))
+        lines.append('branching  nodes')
+        lines.extend('%9d %6d' % item for item in sorted(self.branching.items()))
+        return '\n'.join(lines)
+
 class Link(object): # pylint: disable=too-many-instance-attributes
     'doubly linked node object'
     def __init__(self) -> None:
@@ -51,19 +182,27 @@ class Column(Link):
         '''
         self.right.left = self.left
         self.left.right = self.right
-        for bit0 in self.get_bits_down():
-            for bit in bit0.get_other_bits_right():
+        bit0 = self.down
+        while bit0 is not self:
+            bit = bit0.right
+            while bit is not bit0:
                 bit.down.up = bit.up
                 bit.up.down = bit.down
                 bit.column.size -= 1
+                bit = bit.right
+            bit0 = bit0.down
 
     def uncover(self) -> None:
         'inverse of cover'
-        for bit0 in self.get_bits_up():
-            for bit in bit0.get_other_bits_left():
+        bit0 = self.up
+        while bit0 is not self:
+            bit = bit0.left
+            while bit is not bit0:
                 bit.column.size += 1
                 bit.up.down = bit
                 bit.down.up = bit
+                bit = bit.left
+            bit0 = bit0.up
         self.right.left = self
         self.left.right = self
 
@@ -145,10 +284,13 @@ class Root(Link):
         '''
         Link.__init__(self)
         columns = []
+        self._columns_by_name = {} # type: Dict[COLUMN_NAME, Column]
+        self._rows = [] # type: List[Bit]
         for column_name in column_names:
             column = Column(name=column_name)
             self.insert_left(column)
             columns.append(column)
+            self._columns_by_name[column_name] = column
         for row in set_bits:
             bit0 = None
             for i in row:
@@ -160,44 +302,193 @@ class Root(Link):
                     bit0 = bit
                 else:
                     bit0.insert_left(bit)
+            self._rows.append(bit0)
 
     def _choose(self) -> Column:
-        # returns the column with the least number of 1's
-        smallest_size = 100000000
-        ans = None
-        column = self.right # type: Column
-        while column != self:
-            if column.size < smallest_size: # pylint: disable=no-member
+        # returns the first column with the least number of 1's
+        ans = cast(Column, self.right)
+        column = cast(Column, ans.right)
+        while column is not self:
+            if column.size < ans.size:
+                ans = column
+            column = cast(Column, column.right)
+        return ans
+
+    def _choose_early(self) -> Column:
+        # as _choose, but a column with at most one 1 ends the scan
+        ans = cast(Column, self.right)
+        column = cast(Column, ans.right)
+        while ans.size > 1 and column is not self:
+            if column.size < ans.size:
                 ans = column
-                smallest_size = column.size # pylint: disable=no-member
             column = cast(Column, column.right)
         return ans
 
-    def _search(self,
+    def _choose_random(self, rng: random.Random) -> Column:
+        # returns one of the columns with the least number of 1's
+        ties = [cast(Column, self.right)]
+        column = cast(Column, ties[0].right)
+        while column is not self:
+            if column.size < ties[0].size:
+                ties = [column]
+            elif column.size == ties[0].size:
+                ties.append(column)
+            column = cast(Column, column.right)
+        return ties[rng.randrange(len(ties))]
+
+    def _get_chooser(self, heuristic: str, seed: Optional[int]) -> Callable[[], Column]:
+        # the _choose method of a heuristic, see HEURISTICS
+        if heuristic == 'min':
+            return self._choose
+        if heuristic == 'early':
+            return self._choose_early
+        if heuristic == 'random':
+            rng = random.Random(seed)
+            return lambda: self._choose_random(rng)
+        raise ValueError('Root has no %r heuristic' % heuristic)
+
+    def _search(self, # pylint: disable=too-many-arguments
                 k: int,
                 ohs: List[Bit],
-                bcaster: BROADCASTER
-               ) -> None:
-        # invokes the dancing links search algorithm
+                bcaster: Optional[BROADCASTER],
+                stats: Optional[SearchStats] = None,
+                limit: int = 0,
+                choose: Optional[Callable[[], Column]] = None
+               ) -> int:
+        # invokes the dancing links search algorithm and returns the
+        # number of solutions found, stopping at limit unless it is 0
         if self.right == self:
-            bcaster(_get_column_name_lists(ohs[:k]))
-            return
-        column = self._choose()
+            if stats is not None:
+                stats.solution(k)
+            if bcaster is not None:
+                bcaster(_get_column_name_lists(ohs[:k]))
+            return 1
+        n_found = 0
+        column = choose() if choose is not None else self._choose()
         column.cover()
+        if stats is not None:
+            stats.choose(k, column.size)
         for bit_0 in column.get_bits_down():
             ohs[k] = bit_0
             for bit_1 in bit_0.get_other_bits_right():
                 bit_1.column.cover()
-            self._search(k + 1, ohs, bcaster)
+            if stats is not None:
+                stats.select(_row_length(bit_0))
+            n_found += self._search(k + 1, ohs, bcaster, stats,
+                                    limit - n_found if limit else 0, choose)
             bit_2 = ohs[k]
             column = bit_2.column
             for bit_3 in bit_2.get_other_bits_left():
                 bit_3.column.uncover()
+            if stats is not None:
+                stats.unselect(_row_length(bit_2))
+            if limit and n_found == limit:
+                break
         column.uncover()
+        if stats is not None:
+            stats.leave()
+        return n_found
+
+    def _search_iterative(self,
+                          bcaster: Optional[BROADCASTER],
+                          stats: Optional[SearchStats] = None,
+                          limit: int = 0,
+                          choose: Optional[Callable[[], Column]] = None) -> int:
+        # the same search as _search, driven by an explicit stack of the
+        # chosen columns and rows instead of by recursion
+        choose = choose or self._choose
+        n_columns = sum(1 for _ in self.get_columns())
+        columns = [None] * (n_columns + 1) # type: List[Column]
+        ohs = [None] * (n_columns + 1) # type: List[Bit]
+        n_found = 0
+        k = 0
+        while True:
+            if self.right is self:
+                if stats is not None:
+                    stats.solution(k)
+                if bcaster is not None:
+                    bcaster(_get_column_name_lists(ohs[:k]))
+                n_found += 1
+                bit = column = None
+            else:
+                column = choose()
+                column.cover()
+                if stats is not None:
+                    stats.choose(k, column.size)
+                columns[k] = column
+                bit = column.down
+            # backtrack while the rows of the current column are used up,
+            # or all the way up once the limit has been reached
+            while bit is column:
+                if column is not None:
+                    column.uncover()
+                    if stats is not None:
+                        stats.leave()
+                if k == 0:
+                    return n_found
+                k -= 1
+                bit = ohs[k]
+                other = bit.left
+                while other is not bit:
+                    other.column.uncover()
+                    other = other.left
+                if stats is not None:
+                    stats.unselect(_row_length(bit))
+                column = columns[k]
+                bit = column if limit and n_found == limit else bit.down
+            ohs[k] = bit
+            other = bit.right
+            while other is not bit:
+                other.column.cover()
+                other = other.right
+            if stats is not None:
+                stats.select(_row_length(bit))
+            k += 1
+
+    def search(self, # pylint: disable=too-many-arguments
+               bcaster: Optional[BROADCASTER],
+               iterative: bool = False,
+               stats: Optional[SearchStats] = None,
+               max_solutions: int = 0,
+               heuristic: str = 'min',
+               seed: Optional[int] = None) -> int:
+        '''
+    searches for the solutions of the exact cover problem
+
+    bcaster is called with the column name lists of the rows of each
+    solution, and may be None when only the number of solutions is of
+    interest. The search stops once max_solutions solutions have been
+    found (never when it is 0) and returns the number found. Whether it
+    stops there or runs to the end, every column it covered is uncovered
+    again, so the matrix can be searched again.
+
+    With iterative=True the search runs as a loop over a preallocated
+    stack, which has no recursion overhead and no depth limit. The
+    counters of a SearchStats passed as stats are updated as the search
+    goes, see SearchStats.
 
-    def search(self, bcaster: BROADCASTER) -> None:
-        'searches for the solutions of the exact cover problem'
-        self._search(0, [None]*MAX_OHS_COUNT, bcaster)
+    heuristic names the way the column to branch on is chosen, one of
+    HEURISTICS but 'buckets', and seed seeds the 'random' one. A
+    ValueError is raised for any other name.
+        '''
+        choose = self._get_chooser(heuristic, seed)
+        if stats is not None:
+            stats.start()
+        try:
+            if iterative:
+                return self._search_iterative(bcaster, stats, max_solutions, choose)
+            return self._search(0, [None]*MAX_OHS_COUNT, bcaster, stats,
+                                max_solutions, choose)
+        finally:
+            if stats is not None:
+                stats.stop()
+
+    def count_solutions(self, limit: int = 0) -> int:
+        '''
+    the number of solutions, counting no further than limit (unless it
+    is 0), so count_solutions(2) == 1 tells that the solution is unique
+        '''
+        return self.search(None, iterative=True, max_solutions=limit)
 
     def get_columns(self) -> Iterator[Column]:
         'iterate the columns of the dlx graph'
@@ -206,9 +497,795 @@ class Root(Link):
             yield cast(Column, column)
             column = column.right
 
+    def get_column(self, name: COLUMN_NAME) -> Column:
+        'returns the named column, whether or not it is covered'
+        return self._columns_by_name[name]
+
+    def select_rows(self, rows: List[int]) -> None:
+        '''
+    applies a partial solution
+
+    Each of the given rows (indices into the set_bits the matrix was
+    built from) is taken as part of the solution: the columns it
+    occupies are covered, just as the search does when it chooses a
+    row, and the search then only looks for the rest of the solution.
+    All the rows are checked before any column is covered: if a row
+    occupies a column that is already covered, or one that an earlier
+    row of the list occupies, a ConflictError is raised and the matrix
+    is left as it was.
+        '''
+        selected = [] # type: List[Bit]
+        taken = set() # type: set
+        for row in rows:
+            bit0 = self._rows[row]
+            if bit0 is None:
+                continue
+            bits = [bit0] + list(bit0.get_other_bits_right())
+            for bit in bits:
+                if bit.column.left.right is not bit.column or bit.column in taken:
+                    raise ConflictError(row)
+                taken.add(bit.column)
+            selected.extend(bits)
+        for bit in selected:
+            bit.column.cover()
+
+def _row_length(bit0: Bit) -> int:
+    # the number of other bits in the row of bit0
+    return sum(1 for _ in bit0.get_other_bits_right())
+
 def _get_column_name_lists(bits: List[Bit]) -> Iterator[List[COLUMN_NAME]]:
     for bit0 in bits:
         ans = [bit0.column.name]
         for bit1 in bit0.get_other_bits_right():
             ans.append(bit1.column.name)
         yield ans
+
+class ArrayRoot(object):
+    '''
+    Dancing Links over flat integer arrays
+
+    Same contract as Root, but instead of one Python object per matrix
+    entry the left, right, up, down and column links of every node are
+    stored in flat integer arrays (array('i')) indexed by node number:
+
+        node 0                      the root
+        nodes 1 .. n_columns        the column headers
+        nodes n_columns + 1 ..      the set bits, row by row
+
+    The size of a column is kept in '_size' at the index of its header.
+    '''
+    def __init__(self,
+                 column_names: List[COLUMN_NAME],
+                 set_bits: List[List[int]]) -> None:
+        'see Root.__init__ for the meaning of the arguments'
+        n_columns = len(column_names)
+        col = list(range(n_columns + 1))
+        col.extend([i + 1 for row in set_bits for i in row])
+        n_nodes = len(col)
+        # the nodes of a row are contiguous so only the ends need fixing
+        left = array('i', range(-1, n_nodes - 1))
+        right = array('i', range(1, n_nodes + 1))
+        left[0] = n_columns
+        right[n_columns] = 0
+        rows = array('i')
+        row_of = array('i', [-1]) * (n_columns + 1)
+        node = n_columns + 1
+        for i_row, row in enumerate(set_bits):
+            if row:
+                left[node] = node + len(row) - 1
+                right[node + len(row) - 1] = node
+                rows.append(node)
+                row_of.extend([i_row] * len(row))
+                node += len(row)
+            else:
+                rows.append(-1)
+        # chain every bit below the last bit seen in its column, then
+        # close each column back onto its header
+        up = list(range(n_nodes))      # pylint: disable=invalid-name
+        down = list(range(n_nodes))
+        size = [0] * (n_columns + 1)
+        last = list(range(n_columns + 1))
+        for node in range(n_columns + 1, n_nodes):
+            header = col[node]
+            up[node] = last[header]
+            down[last[header]] = node
+            last[header] = node
+            size[header] += 1
+        for header in range(1, n_columns + 1):
+            down[last[header]] = header
+            up[header] = last[header]
+        self._names = [None] + list(column_names)
+        self._headers = {name: i + 1 for i, name in enumerate(column_names)}
+        self._rows = rows
+        self._row_of = row_of
+        self._left = left
+        self._right = right
+        self._up = array('i', up)
+        self._down = array('i', down)
+        self._col = array('i', col)
+        self._size = array('i', size)
+
+    @classmethod
+    def from_table(cls, # pylint: disable=too-many-locals
+                   column_names: List[COLUMN_NAME],
+                   table: Any,
+                   width: int) -> 'ArrayRoot':
+        '''
+    builds the matrix from a table of column indices instead of set_bits
+
+    The rows of the matrix all occupy 'width' columns, and table holds
+    the occupied columns of one row after the other in a flat sequence
+    of len(table) = width * number of rows integers. When table is a
+    NumPy array the links are computed by whole-array operations, which
+    for large matrices is much faster than building them node by node.
+    A list or an array('i') is split into rows for the constructor, so
+    NumPy is only needed, and only imported, for NumPy tables.
+        '''
+        if isinstance(table, (list, array)) or not len(table):
+            return cls(column_names, [list(table[i:i + width])
+                                      for i in range(0, len(table), width)])
+        import numpy
+        n_columns = len(column_names)
+        n_rows = len(table) // width
+        first = n_columns + 1
+        n_nodes = first + len(table)
+        nodes = numpy.arange(n_nodes, dtype=numpy.intc)
+        col = nodes.copy()
+        col[first:] = table
+        col[first:] += 1
+        # the nodes of a row are contiguous so only the ends need fixing
+        left = nodes - 1
+        right = nodes + 1
+        left[0] = n_columns
+        right[n_columns] = 0
+        starts = first + width * numpy.arange(n_rows, dtype=numpy.intc)
+        left[starts] = starts + width - 1
+        right[starts + width - 1] = starts
+        # sorting the bits by column (stably, so by row within a column)
+        # puts each column's bits next to each other from top to bottom
+        bits = first + numpy.argsort(col[first:], kind='stable').astype(numpy.intc)
+        headers = col[bits]
+        same_as_next = numpy.zeros(len(bits), dtype=bool)
+        same_as_next[:-1] = headers[:-1] == headers[1:]
+        up = nodes.copy()       # pylint: disable=invalid-name
+        down = nodes.copy()
+        down[bits[:-1]] = numpy.where(same_as_next[:-1], bits[1:], headers[:-1])
+        up[bits[1:]] = numpy.where(same_as_next[:-1], bits[:-1], headers[1:])
+        down[bits[-1]] = headers[-1]
+        up[bits[0]] = headers[0]
+        size = numpy.bincount(headers, minlength=first).astype(numpy.intc)
+        column_starts = numpy.searchsorted(headers, nodes[1:first])
+        has_bits = size[1:] > 0
+        # (the start of an empty column may be past the end of bits)
+        tops = numpy.minimum(column_starts, len(bits) - 1)
+        down[1:first] = numpy.where(has_bits, bits[tops], nodes[1:first])
+        up[1:first] = numpy.where(has_bits, bits[tops + size[1:] - 1], nodes[1:first])
+        row_of = numpy.full(n_nodes, -1, dtype=numpy.intc)
+        row_of[first:] = numpy.repeat(numpy.arange(n_rows, dtype=numpy.intc), width)
+        ans = cls.__new__(cls)
+        ans._names = [None] + list(column_names)
+        ans._headers = {name: i + 1 for i, name in enumerate(column_names)}
+        ans._rows = _to_array(starts)
+        ans._row_of = _to_array(row_of)
+        ans._left = _to_array(left)
+        ans._right = _to_array(right)
+        ans._up = _to_array(up)
+        ans._down = _to_array(down)
+        ans._col = _to_array(col)
+        ans._size = _to_array(size)
+        return ans
+
+    def copy(self) -> 'ArrayRoot':
+        '''
+    returns an independent copy of the matrix in its current state
+
+    Only the link arrays are copied, which is a handful of memcpy's, so
+    a pristine matrix can be kept as a template and copied per problem.
+        '''
+        ans = ArrayRoot.__new__(ArrayRoot)
+        ans._names = self._names
+        ans._headers = self._headers
+        ans._rows = self._rows
+        ans._row_of = self._row_of
+        ans._left = self._left[:]
+        ans._right = self._right[:]
+        ans._up = self._up[:]
+        ans._down = self._down[:]
+        ans._col = self._col
+        ans._size = self._size[:]
+        return ans
+
+    def cover_column(self, name: COLUMN_NAME) -> None:
+        'covers the named column unless it has already been covered'
+        column = self._headers[name]
+        if self._right[self._left[column]] == column:
+            self._cover(column)
+
+    def exclude_rows(self, rows: List[int]) -> None:
+        '''
+    takes rows out of the matrix, so no solution found by the search
+    uses them; the rows are unlinked from their columns as cover does,
+    but their columns stay in place. Exclude rows before selecting any:
+    select_rows unlinks rows too and a row must not be unlinked twice.
+        '''
+        up, down, col, size = self._up, self._down, self._col, self._size
+        right = self._right
+        for row in rows:
+            bit0 = self._rows[row]
+            if bit0 < 0:
+                continue
+            bit = bit0
+            while True:
+                up[down[bit]] = up[bit]
+                down[up[bit]] = down[bit]
+                size[col[bit]] -= 1
+                bit = right[bit]
+                if bit == bit0:
+                    break
+
+    def select_rows(self, rows: List[int]) -> None:
+        'applies a partial solution, see Root.select_rows'
+        left, right, col = self._left, self._right, self._col
+        columns = [] # type: List[int]
+        taken = set() # type: set
+        for row in rows:
+            bit0 = self._rows[row]
+            if bit0 < 0:
+                continue
+            bit = bit0
+            while True:
+                column = col[bit]
+                if right[left[column]] != column or column in taken:
+                    raise ConflictError(row)
+                taken.add(column)
+                columns.append(column)
+                bit = right[bit]
+                if bit == bit0:
+                    break
+        for column in columns:
+            self._cover(column)
+
+    def split(self, depth: int) -> List[List[int]]:
+        '''
+    splits the search into independent subproblems
+
+    The first 'depth' levels of the search tree are expanded: at each
+    level the column the search would choose is taken and each of its
+    rows starts a branch. Every returned list of rows (indices into
+    set_bits) is one subproblem, to be applied with select_rows on a
+    copy of this matrix; together the subproblems have exactly the
+    solutions of the whole problem. A branch that is solved before
+    'depth' is reached is returned as it is, and dead branches are
+    left out.
+        '''
+        prefixes = [[]] # type: List[List[int]]
+        for _ in range(depth):
+            branches = []
+            for prefix in prefixes:
+                root = self.copy()
+                root.select_rows(prefix)
+                if root._right[0] == 0:
+                    branches.append(prefix)
+                    continue
+                column = root._choose()
+                bit = root._down[column]
+                while bit != column:
+                    branches.append(prefix + [self._row_of[bit]])
+                    bit = root._down[bit]
+            prefixes = branches
+        return prefixes
+
+    def _choose(self) -> int:
+        # returns the header of the first column with the least number of 1's
+        return _choose_min(self._right, self._size, None)[0]
+
+    def _cover(self, column: int) -> None:
+        _cover(column, self._left, self._right, self._up, self._down,
+               self._col, self._size)
+
+    def _uncover(self, column: int) -> None:
+        _uncover(column, self._left, self._right, self._up, self._down,
+                 self._col, self._size)
+
+    def search(self, # pylint: disable=too-many-arguments
+               bcaster: Optional[BROADCASTER],
+               stats: Optional[SearchStats] = None,
+               max_solutions: int = 0,
+               heuristic: str = 'min',
+               seed: Optional[int] = None) -> int:
+        '''
+    searches for the solutions of the exact cover problem
+
+    This is the explicit-stack search of Root.search(iterative=True), with
+    the same arguments and result. It runs on list copies of the link
+    arrays, which CPython indexes faster than arrays, so the arrays
+    themselves are never touched by a search and it can simply return
+    once max_solutions solutions have been found.
+
+    All of HEURISTICS can be used; 'buckets' takes the same columns as
+    'min', so the two search the same tree.
+        '''
+        if heuristic not in HEURISTICS:
+            raise ValueError('ArrayRoot has no %r heuristic' % heuristic)
+        if stats is not None:
+            stats.start()
+        try:
+            return self._search(bcaster, stats, max_solutions, heuristic, seed)
+        finally:
+            if stats is not None:
+                stats.stop()
+
+    def count_solutions(self, limit: int = 0) -> int:
+        'the number of solutions, up to limit, see Root.count_solutions'
+        return self.search(None, max_solutions=limit)
+
+    def _search(self, # pylint: disable=too-many-arguments,too-many-branches,too-many-locals
+                bcaster: Optional[BROADCASTER],
+                stats: Optional[SearchStats],
+                limit: int,
+                heuristic: str = 'min',
+                seed: Optional[int] = None) -> int:
+        left, right, up, down, col, size = [
+            list(links) for links in (self._left, self._right, self._up,
+                                      self._down, self._col, self._size)]
+        links = [left, right, up, down, col, size] # type: List[Any]
+        cover, uncover = _cover, _uncover
+        if heuristic == 'buckets':
+            buckets = _get_buckets(right, size)
+            links.append(buckets)
+            cover, uncover = _cover_buckets, _uncover_buckets
+            choose = lambda right, size, rng: _choose_bucket(buckets)
+        else:
+            choose = _CHOOSERS[heuristic]
+        rng = random.Random(seed)
+        columns = [0] * len(size)
+        ohs = [0] * len(size)
+        n_found = 0
+        k = 0
+        while True:
+            if right[0] == 0:
+                if stats is not None:
+                    stats.solution(k)
+                if bcaster is not None:
+                    bcaster(self._get_column_name_lists(ohs[:k], right, col))
+                n_found += 1
+                if limit and n_found == limit:
+                    return n_found
+                bit = column = -1
+            else:
+                column, smallest_size = choose(right, size, rng)
+                cover(column, *links)
+                if stats is not None:
+                    stats.choose(k, smallest_size)
+                columns[k] = column
+                bit = down[column]
+            # backtrack while the rows of the current column are used up
+            while bit == column:
+                if column >= 0:
+                    uncover(column, *links)
+                    if stats is not None:
+                        stats.leave()
+                if k == 0:
+                    return n_found
+                k -= 1
+                bit = ohs[k]
+                other = left[bit]
+                while other != bit:
+                    uncover(col[other], *links)
+                    other = left[other]
+                if stats is not None:
+                    stats.unselect(_array_row_length(bit, right))
+                column = columns[k]
+                bit = down[bit]
+            ohs[k] = bit
+            other = right[bit]
+            while other != bit:
+                cover(col[other], *links)
+                other = right[other]
+            if stats is not None:
+                stats.select(_array_row_length(bit, right))
+            k += 1
+
+    def _get_column_name_lists(self,
+                               bits: List[int],
+                               right: List[int],
+                               col: List[int]
+                              ) -> Iterator[List[COLUMN_NAME]]:
+        names = self._names
+        for bit0 in bits:
+            ans = [names[col[bit0]]]
+            bit1 = right[bit0]
+            while bit1 != bit0:
+                ans.append(names[col[bit1]])
+                bit1 = right[bit1]
+            yield ans
+
+class BitsetRoot(object):
+    '''
+    Algorithm X over integer bitsets
+
+    Same contract as ArrayRoot, but nothing is ever relinked: the rows
+    and the columns still in the matrix are the set bits of two Python
+    integers, and the rows that occupy each column are precomputed as
+    one more integer per column. Choosing a row takes out its columns,
+    and every row that shares one of them, with a few ANDs and ORs, and
+    since integers are immutable a row is taken back by returning to
+    the masks of the node above, which the search keeps on its stack.
+
+    The only other state is the number of rows left in each column,
+    lowered for the columns of the rows taken out and raised again on
+    the way back. The numbers are kept in a bytearray, with 255 for a
+    covered column, so the first column with the fewest rows is found
+    by bytearray.find for 0, 1, 2, ... rows in turn rather than by a
+    popcount per column; a column may therefore have at most 254 rows.
+
+    Meant for the Sudoku orders up to 6, where there are at most
+    4 * 6^4 = 5184 columns, and best used on pruned matrices, since a
+    column mask takes a bit for every row of the matrix.
+    '''
+    def __init__(self,
+                 column_names: List[COLUMN_NAME],
+                 set_bits: List[List[int]]) -> None:
+        'see Root.__init__ for the meaning of the arguments'
+        n_rows = len(set_bits)
+        column_rows = [[] for _ in column_names] # type: List[List[int]]
+        for i_row, row in enumerate(set_bits):
+            for i in row:
+                column_rows[i].append(i_row)
+        self._names = list(column_names)
+        self._headers = {name: i for i, name in enumerate(column_names)}
+        self._row_columns = [tuple(row) for row in set_bits]
+        self._column_rows = [_to_mask(rows, n_rows) for rows in column_rows]
+        if any(len(rows) >= _COVERED for rows in column_rows):
+            raise ValueError('a column of a BitsetRoot may have at most %d rows'
+                             % (_COVERED - 1))
+        self._sizes = bytearray(len(rows) for rows in column_rows)
+        self._rows = (1 << n_rows) - 1
+        self._columns = (1 << len(column_names)) - 1
+
+    @classmethod
+    def from_table(cls,
+                   column_names: List[COLUMN_NAME],
+                   table: Any,
+                   width: int) -> 'BitsetRoot':
+        'builds the matrix from a flat table, see ArrayRoot.from_table'
+        if not isinstance(table, list):
+            table = table.tolist()
+        return cls(column_names, [table[i:i + width]
+                                  for i in range(0, len(table), width)])
+
+    def copy(self) -> 'BitsetRoot':
+        '''
+    returns an independent copy of the matrix in its current state
+
+    The precomputed masks are shared, only the masks of what is left of
+    the matrix and the column sizes belong to the copy.
+        '''
+        ans = BitsetRoot.__new__(BitsetRoot)
+        ans.__dict__.update(self.__dict__)
+        ans._sizes = self._sizes[:]
+        return ans
+
+    def cover_column(self, name: COLUMN_NAME) -> None:
+        'covers the named column unless it has already been covered'
+        column = self._headers[name]
+        if self._columns >> column & 1:
+            self._columns ^= 1 << column
+            self._take_out(self._rows & self._column_rows[column])
+            self._sizes[column] = _COVERED
+
+    def exclude_rows(self, rows: List[int]) -> None:
+        '''
+    takes rows out of the matrix, so no solution found by the search
+    uses them; their columns stay in place. Unlike with ArrayRoot this
+    may be done before or after selecting rows.
+        '''
+        self._take_out(self._rows & _to_mask(rows, len(self._row_columns)))
+
+    def select_rows(self, rows: List[int]) -> None:
+        'applies a partial solution, see Root.select_rows'
+        taken = 0
+        for row in rows:
+            for column in self._row_columns[row]:
+                if not self._columns >> column & 1 or taken >> column & 1:
+                    raise ConflictError(row)
+                taken |= 1 << column
+        for row in rows:
+            for column in self._row_columns[row]:
+                self._columns ^= 1 << column
+                self._take_out(self._rows & self._column_rows[column])
+                self._sizes[column] = _COVERED
+
+    def _take_out(self, rows: int) -> None:
+        # removes the given rows, all still in the matrix; a column
+        # whose rows are all taken out is left with size 0
+        self._rows ^= rows
+        sizes, row_columns = self._sizes, self._row_columns
+        while rows:
+            row = rows.bit_length() - 1
+            rows ^= 1 << row
+            for column in row_columns[row]:
+                sizes[column] -= 1
+
+    def search(self, # pylint: disable=too-many-arguments
+               bcaster: Optional[BROADCASTER],
+               stats: Optional[SearchStats] = None,
+               max_solutions: int = 0,
+               heuristic: str = 'min',
+               seed: Optional[int] = None) -> int:
+        '''
+    searches for the solutions of the exact cover problem
+
+    The arguments and the result are those of ArrayRoot.search, and so
+    is the search tree: the column chosen at each node is the first one
+    with the fewest rows and its rows are tried from top to bottom, so
+    both engines visit the same nodes and find the same solutions in
+    the same order. The search works on a copy of the column sizes and
+    the matrix itself is never changed by it.
+
+    Finding the column by size already works like the 'buckets' of
+    HEURISTICS and stops at the first column found, so 'early' and
+    'buckets' choose as 'min' does; 'random' picks among all the
+    columns of the smallest size.
+        '''
+        if heuristic not in HEURISTICS:
+            raise ValueError('BitsetRoot has no %r heuristic' % heuristic)
+        if stats is not None:
+            stats.start()
+        try:
+            return self._search(bcaster, stats, max_solutions,
+                                random.Random(seed) if heuristic == 'random' else None)
+        finally:
+            if stats is not None:
+                stats.stop()
+
+    def count_solutions(self, limit: int = 0) -> int:
+        'the number of solutions, up to limit, see Root.count_solutions'
+        return self.search(None, max_solutions=limit)
+
+    def _search(self, # pylint: disable=too-many-branches,too-many-locals,too-many-statements
+                bcaster: Optional[BROADCASTER],
+                stats: Optional[SearchStats],
+                limit: int,
+                rng: Optional[random.Random] = None) -> int:
+        # a random column of the smallest size is chosen when rng is given
+        column_rows, row_columns = self._column_rows, self._row_columns
+        sizes = self._sizes[:]
+        rows, columns = self._rows, self._columns
+        # for each node above: its masks, the rows of its column not
+        # tried yet, and the row being tried with the rows it took out
+        stack = [] # type: List[Tuple[int, int, int, int, int]]
+        n_found = 0
+        while True:
+            if not columns:
+                if stats is not None:
+                    stats.solution(len(stack))
+                if bcaster is not None:
+                    bcaster(self._get_column_name_lists(
+                        [entry[3] for entry in stack]))
+                n_found += 1
+                if limit and n_found == limit:
+                    return n_found
+                candidates = 0
+            else:
+                # choose the column with the least number of 1's
+                smallest_size = 0
+                column = sizes.find(0)
+                while column < 0:
+                    smallest_size += 1
+                    column = sizes.find(smallest_size)
+                if rng is not None:
+                    ties = [column]
+                    column = sizes.find(smallest_size, column + 1)
+                    while column >= 0:
+                        ties.append(column)
+                        column = sizes.find(smallest_size, column + 1)
+                    column = ties[rng.randrange(len(ties))]
+                if stats is not None:
+                    stats.choose(len(stack), smallest_size)
+                candidates = column_rows[column] & rows
+            # backtrack while the rows of the current column are used up;
+            # only a solution has no columns left, the nodes above do
+            while not candidates:
+                if columns and stats is not None:
+                    stats.leave()
+                if not stack:
+                    return n_found
+                rows, columns, candidates, row, removed = stack.pop()
+                for column in row_columns[row]:
+                    sizes[column] = 0
+                while removed:
+                    other = removed.bit_length() - 1
+                    removed ^= 1 << other
+                    for column in row_columns[other]:
+                        sizes[column] += 1
+                if stats is not None:
+                    stats.unselect(len(row_columns[row]) - 1)
+            low = candidates & -candidates
+            row = low.bit_length() - 1
+            removed = 0
+            for column in row_columns[row]:
+                removed |= column_rows[column]
+            removed &= rows
+            stack.append((rows, columns, candidates ^ low, row, removed))
+            rows ^= removed
+            for column in row_columns[row]:
+                columns ^= 1 << column
+            while removed:
+                other = removed.bit_length() - 1
+                removed ^= 1 << other
+                for column in row_columns[other]:
+                    sizes[column] -= 1
+            for column in row_columns[row]:
+                sizes[column] = _COVERED
+            if stats is not None:
+                stats.select(len(row_columns[row]) - 1)
+
+    def _get_column_name_lists(self, rows: List[int]) -> Iterator[List[COLUMN_NAME]]:
+        names = self._names
+        for row in rows:
+            yield [names[column] for column in self._row_columns[row]]
+
+_COVERED = 255 # the size of a covered column of a BitsetRoot
+
+def _to_mask(indices: List[int], n_bits: int) -> int:
+    # the integer with the given bits set, built as bytes rather than
+    # by shifting one big integer per bit
+    buf = bytearray((n_bits + 7) // 8)
+    for i in indices:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, 'little')
+
+LINKS = List[int]
+
+def _to_array(values: Any) -> array:
+    # the array('i') of a NumPy array of C ints, copied as one block
+    ans = array('i')
+    ans.frombytes(values.tobytes())
+    return ans
+
+def _array_row_length(bit0: int, right: LINKS) -> int:
+    # the number of other bits in the row of bit0
+    ans = 0
+    bit = right[bit0]
+    while bit != bit0:
+        ans += 1
+        bit = right[bit]
+    return ans
+
+# pylint: disable=too-many-arguments
+def _cover(column: int,
+           left: LINKS, right: LINKS, up: LINKS, down: LINKS,
+           col: LINKS, size: LINKS) -> None:
+    # Column.cover for the integer links of ArrayRoot
+    right[left[column]] = right[column]
+    left[right[column]] = left[column]
+    bit0 = down[column]
+    while bit0 != column:
+        bit = right[bit0]
+        while bit != bit0:
+            up[down[bit]] = up[bit]
+            down[up[bit]] = down[bit]
+            size[col[bit]] -= 1
+            bit = right[bit]
+        bit0 = down[bit0]
+
+def _uncover(column: int,
+             left: LINKS, right: LINKS, up: LINKS, down: LINKS,
+             col: LINKS, size: LINKS) -> None:
+    # Column.uncover for the integer links of ArrayRoot
+    bit0 = up[column]
+    while bit0 != column:
+        bit = left[bit0]
+        while bit != bit0:
+            size[col[bit]] += 1
+            down[up[bit]] = bit
+            up[down[bit]] = bit
+            bit = left[bit]
+        bit0 = up[bit0]
+    right[left[column]] = column
+    left[right[column]] = column
+
+def _choose_min(right: LINKS, size: LINKS, _: Any) -> Tuple[int, int]:
+    # the header and size of the first column with the least number of 1's
+    column = right[0]
+    smallest_size = size[column]
+    other = right[column]
+    while other != 0:
+        if size[other] < smallest_size:
+            column = other
+            smallest_size = size[other]
+        other = right[other]
+    return column, smallest_size
+
+def _choose_early(right: LINKS, size: LINKS, _: Any) -> Tuple[int, int]:
+    # as _choose_min, but a column with at most one 1 ends the scan
+    column = right[0]
+    smallest_size = size[column]
+    other = right[column]
+    while smallest_size > 1 and other != 0:
+        if size[other] < smallest_size:
+            column = other
+            smallest_size = size[other]
+        other = right[other]
+    return column, smallest_size
+
+def _choose_random(right: LINKS, size: LINKS, rng: random.Random) -> Tuple[int, int]:
+    # the header and size of one of the columns with the least number of 1's
+    ties = [right[0]]
+    smallest_size = size[ties[0]]
+    other = right[ties[0]]
+    while other != 0:
+        if size[other] < smallest_size:
+            ties = [other]
+            smallest_size = size[other]
+        elif size[other] == smallest_size:
+            ties.append(other)
+        other = right[other]
+    return ties[rng.randrange(len(ties))], smallest_size
+
+# the choice of each heuristic that scans the columns, see HEURISTICS
+_CHOOSERS = {
+    'min': _choose_min,
+    'early': _choose_early,
+    'random': _choose_random,
+} # type: Dict[str, Callable[[LINKS, LINKS, Any], Tuple[int, int]]]
+
+def _get_buckets(right: LINKS, size: LINKS) -> List[Set[int]]:
+    # the headers of the columns left, in a set per number of 1's
+    buckets = [set() for _ in range(max(size) + 1)] # type: List[Set[int]]
+    column = right[0]
+    while column != 0:
+        buckets[size[column]].add(column)
+        column = right[column]
+    return buckets
+
+def _choose_bucket(buckets: List[Set[int]]) -> Tuple[int, int]:
+    # _choose_min from the buckets: the headers are in the order of the
+    # columns, so the first column is the one with the lowest header
+    for smallest_size, bucket in enumerate(buckets):
+        if bucket:
+            return min(bucket), smallest_size
+    raise ValueError('no columns left')
+
+def _cover_buckets(column: int,
+                   left: LINKS, right: LINKS, up: LINKS, down: LINKS,
+                   col: LINKS, size: LINKS, buckets: List[Set[int]]) -> None:
+    # _cover, moving the columns whose size changes to their new buckets
+    right[left[column]] = right[column]
+    left[right[column]] = left[column]
+    buckets[size[column]].remove(column)
+    bit0 = down[column]
+    while bit0 != column:
+        bit = right[bit0]
+        while bit != bit0:
+            up[down[bit]] = up[bit]
+            down[up[bit]] = down[bit]
+            other = col[bit]
+            other_size = size[other]
+            buckets[other_size].remove(other)
+            buckets[other_size - 1].add(other)
+            size[other] = other_size - 1
+            bit = right[bit]
+        bit0 = down[bit0]
+
+def _uncover_buckets(column: int,
+                     left: LINKS, right: LINKS, up: LINKS, down: LINKS,
+                     col: LINKS, size: LINKS, buckets: List[Set[int]]) -> None:
+    # _uncover, moving the columns whose size changes to their new buckets
+    bit0 = up[column]
+    while bit0 != column:
+        bit = left[bit0]
+        while bit != bit0:
+            other = col[bit]
+            other_size = size[other]
+            buckets[other_size].remove(other)
+            buckets[other_size + 1].add(other)
+            size[other] = other_size + 1
+            down[up[bit]] = bit
+            up[down[bit]] = bit
+            bit = left[bit]
+        bit0 = up[bit0]
+    right[left[column]] = column
+    left[right[column]] = column
+    buckets[size[column]].add(column)
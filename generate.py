@@ -0,0 +1,311 @@
+'''
+generate.py
+
+Generates Sudoku puzzles with the Dancing Links solver of sudoku.py.
+
+    1. A random solution grid is made by filling the boxes on the
+       diagonal, which share no row or column, with random permutations
+       of the values, letting the dlx search complete the grid and
+       shuffling its rows and columns within their bands and stacks.
+
+    2. Clues are then removed one symmetry orbit at a time, in random
+       order. An orbit whose removal leaves a puzzle with more than one
+       solution is put back. Removing clues can only add solutions, so
+       an orbit that had to be put back can never be removed later and
+       a single pass over the orbits leaves a minimal puzzle: no orbit
+       of clues can be removed without losing the unique solution.
+
+Each removal costs a uniqueness check, which is what the time goes on at
+orders 4 and 5. The check makes use of the known solution: any other
+solution of the puzzle differs from it in one of the removed cells, so
+for each removed cell the dlx search only has to look for a single
+solution with that cell's value excluded (and the cells removed before
+it kept), which usually fails fast, rather than count two solutions.
+Some checks do not, though: without a limit an order 4 puzzle took
+from 3 s to 4 minutes on one CPU. The command line therefore gives
+every check a budget of search nodes (--max-nodes, see reduce_clues)
+and keeps the clues of a check that runs out of it. This took order 4
+puzzles to 2 - 4 s with 93 - 101 clues, against 91 - 95 without the
+limit, and an order 5 puzzle to about 15 s, while the order 3 puzzles
+came out the same. Many puzzles can be generated on a pool of worker
+processes within a time budget.
+
+The puzzles are written as YAML in the format of input.yaml.
+'''
+
+import math
+import random
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import click
+import dlx
+import sudoku
+
+Puzzle = List[List[int]]                    # pylint: disable=invalid-name
+Cell = Tuple[int, int]
+
+def _none(_: int, row: int, col: int) -> List[Cell]:
+    return [(row, col)]
+
+def _rotational(n2: int, row: int, col: int) -> List[Cell]:
+    # 180 degree rotation about the centre
+    return [(row, col), (n2 - 1 - row, n2 - 1 - col)]
+
+def _mirror(n2: int, row: int, col: int) -> List[Cell]:
+    # reflection in the vertical centre line
+    return [(row, col), (row, n2 - 1 - col)]
+
+def _diagonal(_: int, row: int, col: int) -> List[Cell]:
+    # reflection in the main diagonal
+    return [(row, col), (col, row)]
+
+def _rotational90(n2: int, row: int, col: int) -> List[Cell]:
+    # all four 90 degree rotations
+    return [(row, col), (col, n2 - 1 - row),
+            (n2 - 1 - row, n2 - 1 - col), (n2 - 1 - col, row)]
+
+def _dihedral(n2: int, row: int, col: int) -> List[Cell]:
+    # the rotations and the reflections in both centre lines and both
+    # diagonals, all the symmetries of the square
+    return _rotational90(n2, row, col) + [(row, n2 - 1 - col), (n2 - 1 - row, col),
+                                           (col, row), (n2 - 1 - col, n2 - 1 - row)]
+
+# name: the cells that a clue in (row, col) is added and removed with
+SYMMETRIES = {
+    'none': _none,
+    'rotational': _rotational,
+    'mirror': _mirror,
+    'diagonal': _diagonal,
+    'rotational90': _rotational90,
+    'dihedral': _dihedral,
+} # type: Dict[str, Callable[[int, int, int], List[Cell]]]
+
+def shuffled_lines(order: int, rng: random.Random) -> List[int]:
+    'a random permutation of the rows (or columns) that keeps the boxes intact'
+    bands = list(range(order))
+    rng.shuffle(bands)
+    ans = []
+    for band in bands:
+        lines = list(range(band * order, (band + 1) * order))
+        rng.shuffle(lines)
+        ans.extend(lines)
+    return ans
+
+def random_grid(order: int, rng: random.Random) -> Puzzle:
+    'a random solution grid of the given order'
+    n2 = order * order
+    solutions = [] # type: List[Puzzle]
+    while not solutions:
+        # a filling of the diagonal boxes can almost always be
+        # completed; at order 2 it sometimes cannot, so draw again
+        zero_rows = [[0] * n2 for _ in range(n2)]
+        for box in range(order):
+            values = list(range(1, n2 + 1))
+            rng.shuffle(values)
+            for i, value in enumerate(values):
+                zero_rows[box * order + i // order][box * order + i % order] = value
+        solutions = sudoku.solve(zero_rows)
+    grid = solutions[0]
+    rows = shuffled_lines(order, rng)
+    cols = shuffled_lines(order, rng)
+    return [[grid[row][col] for col in cols] for row in rows]
+
+def _get_orbits(n2: int, symmetry: str) -> List[List[Cell]]:
+    # the cells of the grid grouped into the orbits of the symmetry
+    cells = SYMMETRIES[symmetry]
+    seen = set()
+    ans = []
+    for row in range(n2):
+        for col in range(n2):
+            if (row, col) not in seen:
+                orbit = sorted(set(cells(n2, row, col)))
+                seen.update(orbit)
+                ans.append(orbit)
+    return ans
+
+class _BudgetExceeded(Exception):
+    'Exception thrown by _NodeBudget when a check visits too many nodes'
+
+class _NodeBudget(dlx.SearchStats):
+    '''
+    Search counters that stop the searches they are passed to, all of
+    them together, once they have visited max_nodes nodes
+    '''
+    def __init__(self, max_nodes: int) -> None:
+        dlx.SearchStats.__init__(self)
+        self._left = max_nodes
+
+    def choose(self, depth: int, size: int) -> None:
+        dlx.SearchStats.choose(self, depth, size)
+        self._left -= 1
+        if not self._left:
+            raise _BudgetExceeded()
+
+def has_other_solution(puzzle: Puzzle, grid: Puzzle, cells: List[Cell],
+                       max_nodes: int = 0) -> bool:
+    '''
+    True if the puzzle has a solution other than grid, given that grid is
+    its only solution once the given (empty) cells are filled in from it.
+    With max_nodes > 0 the searches stop after that many nodes between
+    them, and a check stopped like that counts as finding one.
+    '''
+    order = int(math.sqrt(len(grid)))
+    solver = sudoku.Sudoku(order, puzzle)
+    puzzle = [list(row) for row in puzzle]
+    stats = _NodeBudget(max_nodes) if max_nodes > 0 else None
+    try:
+        for row, col in cells:
+            excluded = solver.get_dlx_row(grid[row][col] - 1, row, col)
+            root = solver.get_pruned_root(puzzle, [excluded])
+            if root.search(None, stats=stats, max_solutions=1,
+                           heuristic=sudoku.HEURISTIC):
+                return True
+            # the next cells only need looking at with this one as in grid
+            puzzle[row][col] = grid[row][col]
+    except _BudgetExceeded:
+        return True
+    return False
+
+def reduce_clues(grid: Puzzle,
+                 rng: random.Random,
+                 symmetry: str = 'none',
+                 max_nodes: int = 0) -> Puzzle:
+    '''
+    Removes as many clues from a solution grid as it can while keeping
+    the solution unique, see the module description, and returns the
+    minimal puzzle. The grid itself is left unchanged.
+
+    With max_nodes > 0 every orbit's uniqueness check is stopped after
+    that many search nodes and the orbit is kept, which bounds the cost
+    of a puzzle to about max_nodes nodes per orbit. The solution is
+    still unique, but the puzzle is only minimal as far as the checks
+    that finished in time can tell.
+    '''
+    puzzle = [list(row) for row in grid]
+    orbits = _get_orbits(len(grid), symmetry)
+    rng.shuffle(orbits)
+    for orbit in orbits:
+        for row, col in orbit:
+            puzzle[row][col] = 0
+        if has_other_solution(puzzle, grid, orbit, max_nodes):
+            for row, col in orbit:
+                puzzle[row][col] = grid[row][col]
+    return puzzle
+
+def generate(order: int,
+             symmetry: str = 'none',
+             seed: Optional[int] = None,
+             max_nodes: int = 0) -> Puzzle:
+    '''
+    a random minimal puzzle of the given order and symmetry, see
+    reduce_clues for max_nodes
+    '''
+    rng = random.Random(seed)
+    return reduce_clues(random_grid(order, rng), rng, symmetry, max_nodes)
+
+def _generate_task(args: Tuple[int, str, int, int, int]) -> Puzzle:
+    # worker for generate_many: the puzzle number index of the run
+    order, symmetry, seed, index, max_nodes = args
+    return generate(order, symmetry, seed * 1000003 + index, max_nodes)
+
+def generate_many(order: int,
+                  count: int,
+                  symmetry: str = 'none',
+                  seed: int = 0,
+                  processes: int = 1,
+                  seconds: float = 0.0,
+                  max_nodes: int = 0) -> Iterator[Puzzle]:
+    '''
+    Yields count random minimal puzzles, as they are finished, from a
+    pool of worker processes (0 for one per CPU). Puzzle number i of a
+    run is generated from seed and i alone, so a run with the same
+    seed gives the same puzzles whatever the number of processes,
+    though not necessarily in the same order.
+
+    With seconds > 0 the puzzles are generated on a pool even for
+    processes=1, and the generator stops once that much time has passed
+    since it started: the pool is terminated, dropping the puzzles still
+    being worked on, and no puzzle is yielded after that time. The time
+    the caller takes between puzzles counts too; starting and stopping
+    the pool may add a fraction of a second. max_nodes bounds the
+    uniqueness checks of each puzzle, see reduce_clues.
+    '''
+    tasks = [(order, symmetry, seed, index, max_nodes) for index in range(count)]
+    if processes == 1 and seconds <= 0:
+        for task in tasks:
+            yield _generate_task(task)
+        return
+    import multiprocessing
+    deadline = time.time() + seconds
+    with multiprocessing.Pool(processes or multiprocessing.cpu_count()) as pool:
+        results = pool.imap_unordered(_generate_task, tasks)
+        while True:
+            try:
+                if seconds > 0:
+                    puzzle = results.next(timeout=max(0.0, deadline - time.time()))
+                else:
+                    puzzle = next(results)
+            except StopIteration:
+                return
+            except multiprocessing.TimeoutError:
+                pool.terminate()
+                return
+            if seconds > 0 and time.time() > deadline:
+                pool.terminate()
+                return
+            yield puzzle
+
+def _count_clues(puzzle: Puzzle) -> int:
+    return sum(1 for row in puzzle for value in row if value)
+
+def _write_yaml(fobj, puzzles: Iterator[Puzzle]) -> int:
+    # writes the puzzles as they come in the format of input.yaml and
+    # returns how many there were
+    fobj.write('[\n')
+    count = 0
+    for puzzle in puzzles:
+        fobj.write('    {\n')
+        fobj.write('        clues: %d,\n' % _count_clues(puzzle))
+        fobj.write('        dot_rows: [\n')
+        for dot_row in sudoku.zero_rows_to_dot_rows(puzzle):
+            fobj.write("            '%s',\n" % dot_row)
+        fobj.write('        ]\n')
+        fobj.write('    },\n')
+        fobj.flush()
+        count += 1
+    fobj.write(']\n')
+    return count
+
+@click.command()
+@click.option("--order", type=click.IntRange(2, 6), default=3, show_default=True)
+@click.option("--count", type=int, default=10, show_default=True,
+              help='number of puzzles to generate')
+@click.option("--symmetry", type=click.Choice(sorted(SYMMETRIES)),
+              default='none', show_default=True,
+              help='symmetry of the pattern of clues')
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--processes", "-j", type=int, default=1,
+              help='worker processes (0: one per CPU)')
+@click.option("--seconds", type=float, default=0.0,
+              help='time budget: stop generating after this many seconds')
+@click.option("--max-nodes", type=int, default=2000, show_default=True,
+              help='search nodes a uniqueness check may take before its clues are '
+                   'kept (0: no limit, for strictly minimal puzzles)')
+@click.option("--output", type=str, default='-',
+              help='YAML file to write the puzzles to (default stdout)')
+def main(order: int, count: int, symmetry: str, seed: int, # pylint: disable=too-many-arguments
+         processes: int, seconds: float, max_nodes: int, output: str) -> None:
+    'main entry point'
+    start = time.time()
+    with click.open_file(output, 'w') as fobj:
+        n_puzzles = _write_yaml(fobj, generate_many(order, count, symmetry, seed,
+                                                    processes, seconds, max_nodes))
+    elapsed = time.time() - start
+    click.echo('generated %d of %d puzzles in %.3f s (%.2f puzzles/sec)'
+               % (n_puzzles, count, elapsed,
+                  n_puzzles / elapsed if elapsed > 0 else 0.0),
+               err=True)
+
+if __name__ == '__main__':
+    # pylint: disable=no-value-for-parameter
+    main()
@@ -0,0 +1,150 @@
+'''
+grade.py
+
+Grades Sudoku puzzles by the deduction techniques they need (see
+logic.py) and by the effort of the exact cover search.
+
+The level of a puzzle is the hardest technique that deduction needs to
+solve it, tried simplest first:
+
+    easy        naked singles only
+    medium      hidden singles
+    hard        locked candidates
+    expert      naked or hidden pairs
+    evil        deduction gets stuck and the rest needs a search
+    multiple    the puzzle has more than one solution, so it is no
+                proper Sudoku; its nodes and backtracks are those of
+                a search stopped at the second solution and measure
+                nothing about it
+    invalid     the puzzle has no solution
+
+which puts the puzzles of puzzles.yaml at the levels they were given
+by hand. The effort is counted on a search of the whole puzzle, not
+what deduction leaves of it, for two solutions: for a puzzle with a
+unique solution that is the whole search tree, so the nodes do not
+depend on how early the solution happens to turn up. The nodes are the
+cost to sort a corpus by before scheduling it.
+
+    python grade.py --path input.yaml -j 0 --sort --output grades.jsonl
+
+writes a JSON line per puzzle, the cheapest first with --sort.
+'''
+
+import collections
+import functools
+import json
+import math
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import click
+import dlx
+import logic
+import sudoku
+
+Puzzle = List[List[int]]                    # pylint: disable=invalid-name
+
+LEVELS = ('easy', 'medium', 'hard', 'expert', 'evil', 'multiple', 'invalid')
+
+Grade = collections.namedtuple('Grade',
+                               'level techniques solutions nodes backtracks seconds')
+
+def _get_level(techniques: Dict[str, int], complete: bool) -> str:
+    # the level of a puzzle with a solution, see the module docstring
+    if not complete:
+        return 'evil'
+    if techniques['naked pair'] or techniques['hidden pair']:
+        return 'expert'
+    if techniques['locked candidates']:
+        return 'hard'
+    if techniques['hidden single']:
+        return 'medium'
+    return 'easy'
+
+def grade(zero_rows: Puzzle, engine: str = 'array') -> Grade:
+    '''
+    Grades a puzzle in the zero row representation: its level (one of
+    LEVELS), how often deduction used each technique (see
+    logic.deduce), its number of solutions counted up to 2 and the
+    nodes, backtracks (the rows that only led to dead ends, see
+    dlx.SearchStats) and seconds of the search that counted them, on
+    the exact cover engine of that name in sudoku.ENGINES.
+    '''
+    order = int(math.sqrt(len(zero_rows)))
+    stats = dlx.SearchStats()
+    try:
+        root = sudoku.Sudoku(order, zero_rows).get_pruned_root(zero_rows, engine=engine)
+        solutions = root.search(None, stats=stats, max_solutions=2,
+                                heuristic=sudoku.HEURISTIC)
+    except dlx.ConflictError:
+        solutions = 0
+    try:
+        residual, techniques = logic.deduce(zero_rows)
+    except logic.Contradiction:
+        residual, techniques = zero_rows, dict.fromkeys(logic.TECHNIQUES, 0)
+    if not solutions:
+        level = 'invalid'
+    elif solutions > 1:
+        level = 'multiple'
+    else:
+        level = _get_level(techniques, logic.is_complete(residual))
+    return Grade(level, techniques, solutions, sum(stats.nodes), stats.backtracks,
+                 stats.elapsed)
+
+def grade_many(puzzles: Iterable[Puzzle],
+               processes: int = 1,
+               chunksize: int = 0,
+               engine: str = 'array') -> Iterator[Grade]:
+    '''
+    Grades puzzles one after the other and yields their grades in the
+    same order. With processes > 1 (or 0 for one per CPU) the puzzles are
+    spread over a pool of worker processes and streamed as in
+    sudoku.solve_many.
+    '''
+    return sudoku.map_puzzles(functools.partial(grade, engine=engine),
+                              puzzles, processes, chunksize)
+
+def to_json(index: int, puzzle_grade: Grade) -> str:
+    'a grade as a line of JSON, with the number of its puzzle'
+    return json.dumps(collections.OrderedDict(
+        [('puzzle', index)] + list(puzzle_grade._asdict().items())))
+
+@click.command()
+@click.option("--path", type=str, required=True,
+              help='puzzle file, see sudoku.iter_puzzles')
+@click.option("--range", "puzzle_range", type=str,
+              help='zero based START:STOP of the puzzles to grade (default all)')
+@click.option("--processes", "-j", type=int, default=1,
+              help='worker processes (0: one per CPU)')
+@click.option("--engine", type=click.Choice(sorted(sudoku.ENGINES)), default='array',
+              show_default=True, help='exact cover engine to measure the effort on')
+@click.option("--sort", "sort_by_cost", is_flag=True,
+              help='write the grades cheapest first, by search nodes; this keeps '
+                   'them all in memory')
+@click.option("--output", type=str, default='-',
+              help='file to write a JSON line per puzzle to (default stdout)')
+def main(path: str, puzzle_range: Optional[str], processes: int, # pylint: disable=too-many-arguments
+         engine: str, sort_by_cost: bool, output: str) -> None:
+    'main entry point'
+    start, stop = sudoku.parse_range(puzzle_range or ':')
+    start_time = time.time()
+    grades = enumerate(grade_many(sudoku.iter_puzzles(path, start, stop),
+                                  processes=processes, engine=engine),
+                       start) # type: Any
+    if sort_by_cost:
+        grades = sorted(grades, key=lambda item: (item[1].nodes, item[0]))
+    levels = collections.Counter() # type: Dict[str, int]
+    with click.open_file(output, 'w') as fobj:
+        for index, puzzle_grade in grades:
+            levels[puzzle_grade.level] += 1
+            fobj.write(to_json(index, puzzle_grade) + '\n')
+    elapsed = time.time() - start_time
+    n_puzzles = sum(levels.values())
+    click.echo('graded %d puzzles in %.3f s (%.1f puzzles/sec): %s'
+               % (n_puzzles, elapsed, n_puzzles / elapsed if elapsed > 0 else 0.0,
+                  ', '.join('%d %s' % (levels[level], level)
+                            for level in LEVELS if levels[level])),
+               err=True)
+
+if __name__ == '__main__':
+    # pylint: disable=no-value-for-parameter
+    main()
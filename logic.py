@@ -0,0 +1,270 @@
+'''
+logic.py
+
+Solving as much of a Sudoku puzzle as deduction allows, before any
+search.
+
+Every blank cell keeps a mask of the values it can still take (bit v-1
+for the value v), and the techniques below remove candidates and fill
+cells until none of them applies:
+
+    naked single        a cell with one candidate left takes it
+    hidden single       a value with one place left in a row, column
+                        or box goes there
+    locked candidates   a value confined to the cells a box shares with
+                        a line is removed from the rest of the line, and
+                        one confined to them in the line from the rest
+                        of the box
+    naked pair          two cells of a unit with the same two
+                        candidates take both values from the other cells
+    hidden pair         two values with the same two places in a unit
+                        leave those cells no other candidates
+
+After every step the simplest technique is tried first again, so the
+counts that deduce returns say which techniques a puzzle needs and how
+often, as a person solving it would use them.
+
+Every cell filled here has that value in every solution of the puzzle,
+so the puzzle that deduce returns has exactly the solutions of the one
+it was given, and the exact cover search (see sudoku.solve) only has to
+place what is left.
+'''
+
+import math
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+Puzzle = List[List[int]]                    # pylint: disable=invalid-name
+
+TECHNIQUES = ('naked single', 'hidden single', 'locked candidates',
+              'naked pair', 'hidden pair')
+
+# the _Grid method of each technique
+_STEPS = dict(zip(TECHNIQUES, ('naked_singles', 'hidden_singles', 'locked_candidates',
+                               'naked_pairs', 'hidden_pairs')))
+
+class Contradiction(Exception):
+    'Exception thrown when a puzzle is found to have no solution'
+
+# the units, peers and box/line intersections of each order
+_GEOMETRIES = {} # type: Dict[int, _Geometry]
+
+class _Geometry(object):
+    'the cells of the units of a grid, as indices into the grid row after row'
+    def __init__(self, order: int) -> None:
+        n2 = order * order
+        rows = [[r * n2 + c for c in range(n2)] for r in range(n2)]
+        cols = [[r * n2 + c for r in range(n2)] for c in range(n2)]
+        boxes = [[(br * order + r) * n2 + bc * order + c
+                  for r in range(order) for c in range(order)]
+                 for br in range(order) for bc in range(order)]
+        self.units = rows + cols + boxes
+        peers = [set() for _ in range(n2 * n2)] # type: List[set]
+        for unit in self.units:
+            for cell in unit:
+                peers[cell].update(unit)
+        for cell, cell_peers in enumerate(peers):
+            cell_peers.discard(cell)
+        self.peers = [sorted(cell_peers) for cell_peers in peers]
+        # (segment, rest of the box, rest of the line) for every line
+        # crossing every box
+        self.intersections = [] # type: List[Tuple[List[int], List[int], List[int]]]
+        for box in boxes:
+            box_set = set(box)
+            for line in rows + cols:
+                segment = [cell for cell in line if cell in box_set]
+                if segment:
+                    self.intersections.append(
+                        (segment,
+                         [cell for cell in box if cell not in segment],
+                         [cell for cell in line if cell not in box_set]))
+
+def _get_geometry(order: int) -> _Geometry:
+    geometry = _GEOMETRIES.get(order)
+    if geometry is None:
+        geometry = _GEOMETRIES[order] = _Geometry(order)
+    return geometry
+
+def clear_caches() -> None:
+    'forgets the units and peers computed so far, of every order'
+    _GEOMETRIES.clear()
+
+class _Grid(object):
+    'the values and candidate masks of the cells of a puzzle being deduced'
+    def __init__(self, zero_rows: Puzzle) -> None:
+        order = int(math.sqrt(len(zero_rows)))
+        self.n2 = order * order
+        self.geometry = _get_geometry(order)
+        self.full = (1 << self.n2) - 1
+        self.values = [0] * (self.n2 * self.n2)
+        self.candidates = [self.full] * (self.n2 * self.n2)
+        for cell, value in enumerate(v for row in zero_rows for v in row):
+            if value:
+                self.place(cell, value)
+
+    def place(self, cell: int, value: int) -> None:
+        'fills a cell and removes its value from the candidates of its peers'
+        bit = 1 << (value - 1)
+        if not self.candidates[cell] & bit or self.values[cell]:
+            raise Contradiction()
+        self.values[cell] = value
+        self.candidates[cell] = 0
+        candidates = self.candidates
+        for peer in self.geometry.peers[cell]:
+            if candidates[peer] & bit:
+                candidates[peer] ^= bit
+                if not candidates[peer] and not self.values[peer]:
+                    raise Contradiction()
+
+    def eliminate(self, cells: Iterable[int], mask: int) -> bool:
+        'removes the values of mask from the candidates of the cells, True if any were there'
+        candidates = self.candidates
+        changed = False
+        for cell in cells:
+            if candidates[cell] & mask:
+                candidates[cell] &= ~mask
+                if not candidates[cell]:
+                    raise Contradiction()
+                changed = True
+        return changed
+
+    def naked_singles(self) -> int:
+        'fills the cells with a single candidate, returns how many'
+        count = 0
+        candidates = self.candidates
+        for cell, mask in enumerate(candidates):
+            if mask and not mask & (mask - 1):
+                self.place(cell, mask.bit_length())
+                count += 1
+        return count
+
+    def hidden_singles(self) -> int:
+        'fills the cells that are the only place of a value in a unit, returns how many'
+        count = 0
+        candidates = self.candidates
+        values = self.values
+        for unit in self.geometry.units:
+            once = twice = placed = 0
+            for cell in unit:
+                mask = candidates[cell]
+                twice |= once & mask
+                once |= mask
+                if values[cell]:
+                    placed |= 1 << (values[cell] - 1)
+            if (once | placed) != self.full:
+                raise Contradiction()
+            singles = once & ~twice
+            while singles:
+                bit = singles & -singles
+                singles ^= bit
+                for cell in unit:
+                    if candidates[cell] & bit:
+                        self.place(cell, bit.bit_length())
+                        count += 1
+                        break
+                else:
+                    # its only place took another value
+                    raise Contradiction()
+        return count
+
+    def locked_candidates(self) -> int:
+        'removes the candidates locked in box/line intersections, returns how often'
+        count = 0
+        candidates = self.candidates
+        for segment, box_rest, line_rest in self.geometry.intersections:
+            in_segment = 0
+            for cell in segment:
+                in_segment |= candidates[cell]
+            if not in_segment:
+                continue
+            in_box = in_line = 0
+            for cell in box_rest:
+                in_box |= candidates[cell]
+            for cell in line_rest:
+                in_line |= candidates[cell]
+            # pointing: only the segment has them in the box
+            pointing = in_segment & ~in_box
+            if pointing and self.eliminate(line_rest, pointing):
+                count += 1
+            # claiming: only the segment has them in the line
+            claiming = in_segment & ~in_line
+            if claiming and self.eliminate(box_rest, claiming):
+                count += 1
+        return count
+
+    def naked_pairs(self) -> int:
+        'removes the values of naked pairs from the rest of their units, returns how often'
+        count = 0
+        candidates = self.candidates
+        for unit in self.geometry.units:
+            seen = {} # type: Dict[int, int]
+            for cell in unit:
+                mask = candidates[cell]
+                rest = mask & (mask - 1)
+                if not rest or rest & (rest - 1):
+                    continue
+                if mask not in seen:
+                    seen[mask] = cell
+                    continue
+                pair = (seen[mask], cell)
+                if self.eliminate((c for c in unit if c not in pair), mask):
+                    count += 1
+        return count
+
+    def hidden_pairs(self) -> int:
+        'strips the cells of hidden pairs down to the pair, returns how often'
+        count = 0
+        candidates = self.candidates
+        for unit in self.geometry.units:
+            places = {} # type: Dict[int, List[int]]
+            for cell in unit:
+                mask = candidates[cell]
+                while mask:
+                    bit = mask & -mask
+                    mask ^= bit
+                    places.setdefault(bit, []).append(cell)
+            seen = {} # type: Dict[Tuple[int, ...], int]
+            for bit, cells in places.items():
+                if len(cells) != 2:
+                    continue
+                key = tuple(cells)
+                if key not in seen:
+                    seen[key] = bit
+                    continue
+                pair = seen[key] | bit
+                if self.eliminate(cells, ~pair & self.full):
+                    count += 1
+        return count
+
+    def to_zero_rows(self) -> Puzzle:
+        'the values of the cells, 0 for the blank ones'
+        return [self.values[r * self.n2:(r + 1) * self.n2] for r in range(self.n2)]
+
+def deduce(zero_rows: Puzzle,
+           techniques: Sequence[str] = TECHNIQUES) -> Tuple[Puzzle, Dict[str, int]]:
+    '''
+    Applies the techniques (some of TECHNIQUES, simplest first) to a
+    puzzle in the zero row representation until none of them makes
+    progress. Returns the puzzle with every cell they filled and how
+    often each technique was used: the cells filled by the singles, the
+    steps that removed candidates for the others.
+
+    The puzzle given is not changed. A Contradiction is raised if the
+    puzzle turns out to have no solution, its initial values included.
+    '''
+    grid = _Grid(zero_rows)
+    steps = [(name, getattr(grid, _STEPS[name])) for name in techniques]
+    counts = dict.fromkeys(techniques, 0)
+    progress = True
+    while progress:
+        progress = False
+        for name, step in steps:
+            count = step()
+            if count:
+                counts[name] += count
+                progress = True
+                break
+    return grid.to_zero_rows(), counts
+
+def is_complete(zero_rows: Puzzle) -> bool:
+    'True if no cell of the puzzle is blank'
+    return all(all(row) for row in zero_rows)
@@ -0,0 +1,196 @@
+'''
+packed.py
+
+A compact binary format for Sudoku puzzles and solutions.
+
+The file starts with a 16 byte header
+
+    magic       4 bytes     b'SDKP'
+    version     1 byte      1
+    order       1 byte      2, 3, 4, ...
+    cell bits   1 byte      4 or 8
+    reserved    1 byte      0
+    count       8 bytes     number of records, little endian
+
+followed by count fixed-width records, one per puzzle, holding the cell
+values (0 for a blank cell) row after row. Up to order 3 the values fit
+in a nibble and two cells share a byte, the first in the high nibble, so
+a 9 x 9 puzzle takes 41 bytes; from order 4 on every cell takes a byte.
+
+Since the records have a fixed width, puzzle i starts at byte
+16 + i * record_size: a Reader maps the file into memory and decodes only
+the records asked for, without reading or parsing the ones before them.
+'''
+
+import binascii
+import mmap
+import struct
+from typing import Iterable, Iterator, List, Optional
+import click
+
+Puzzle = List[List[int]]                    # pylint: disable=invalid-name
+
+MAGIC = b'SDKP'
+VERSION = 1
+SUFFIX = '.sdkp'
+_HEADER = struct.Struct('<4sBBBxQ')
+
+# hexlify turns every nibble into a hex digit, this turns it back into
+# its value, so a nibble record is unpacked to a byte per cell in C
+_HEX_DIGIT_VALUES = bytes.maketrans(b'0123456789abcdef', bytes(range(16)))
+
+def _get_cell_bits(order: int) -> int:
+    return 4 if order * order < 16 else 8
+
+def record_size(order: int) -> int:
+    'the bytes of the record of a puzzle of the order'
+    n4 = order ** 4
+    return (n4 + 1) // 2 if _get_cell_bits(order) == 4 else n4
+
+def order_of(zero_rows: Puzzle) -> int:
+    'the order of a puzzle in the zero row representation'
+    import math
+    return int(math.sqrt(len(zero_rows)))
+
+def encode(zero_rows: Puzzle) -> bytes:
+    'the record of a puzzle in the zero row representation'
+    values = [value for row in zero_rows for value in row]
+    if _get_cell_bits(order_of(zero_rows)) == 8:
+        return bytes(values)
+    if len(values) % 2:
+        values.append(0)
+    return bytes((values[i] << 4) | values[i + 1] for i in range(0, len(values), 2))
+
+def decode(record: bytes, order: int) -> Puzzle:
+    'the inverse of encode; record may be any bytes-like object'
+    n2 = order * order
+    if _get_cell_bits(order) == 4:
+        record = binascii.hexlify(record).translate(_HEX_DIGIT_VALUES)
+    return [list(record[i:i + n2]) for i in range(0, n2 * n2, n2)]
+
+def is_packed(path: str) -> bool:
+    'True if the file starts with the magic of this format'
+    with open(path, 'rb') as fobj:
+        return fobj.read(len(MAGIC)) == MAGIC
+
+def write(path: str, puzzles: Iterable[Puzzle]) -> int:
+    '''
+    Writes the puzzles, all of the same order (a ValueError is raised
+    otherwise), to a new file and returns how many there were. The
+    puzzles are written as they come, so an iterator of any length can
+    be written in constant memory; the count in the header is filled in
+    at the end, and also when an error stops the writing, so the file
+    then holds the puzzles written before it.
+    '''
+    count = 0
+    order = None # type: Optional[int]
+    with open(path, 'wb') as fobj:
+        fobj.write(_HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        try:
+            for zero_rows in puzzles:
+                if order is None:
+                    order = order_of(zero_rows)
+                elif order_of(zero_rows) != order:
+                    raise ValueError('puzzle %d is of order %d, not %d'
+                                     % (count, order_of(zero_rows), order))
+                fobj.write(encode(zero_rows))
+                count += 1
+        finally:
+            order = order or 3
+            fobj.seek(0)
+            fobj.write(_HEADER.pack(MAGIC, VERSION, order, _get_cell_bits(order), count))
+    return count
+
+class Reader(object):
+    '''
+    Random access to the puzzles of a packed file through a read-only
+    memory map: reader[i] decodes puzzle i alone, reader.record(i) is
+    its record as a memoryview into the map (no copy), and iterating
+    over reader.iter(start, stop) decodes the records one by one.
+    '''
+    def __init__(self, path: str) -> None:
+        self._fobj = open(path, 'rb')
+        self._map = mmap.mmap(self._fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, version, self.order, _, self.count = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('%s is not a packed puzzle file' % path)
+        self.record_size = record_size(self.order)
+        if len(self._map) < _HEADER.size + self.count * self.record_size:
+            self.close()
+            raise ValueError('%s is truncated' % path)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, index: int) -> memoryview:
+        'the record of puzzle index, without copying it'
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('puzzle %d out of range' % index)
+        start = _HEADER.size + index * self.record_size
+        return self._view[start:start + self.record_size]
+
+    def __getitem__(self, index: int) -> Puzzle:
+        return decode(self.record(index), self.order)
+
+    def iter(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Puzzle]:
+        'the puzzles start .. stop - 1 (to the end when stop is None)'
+        start, stop, _ = slice(start, stop).indices(self.count)
+        view, size, order = self._view, self.record_size, self.order
+        offset = _HEADER.size + start * size
+        for _ in range(start, stop):
+            yield decode(view[offset:offset + size], order)
+            offset += size
+
+    def __iter__(self) -> Iterator[Puzzle]:
+        return self.iter()
+
+    def close(self) -> None:
+        'releases the memory map and the file'
+        self._view.release()
+        self._map.close()
+        self._fobj.close()
+
+    def __enter__(self) -> 'Reader':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+@click.group()
+def main() -> None:
+    'converts puzzle files to and from the packed format'
+
+@main.command()
+@click.argument("source", type=str)
+@click.argument("target", type=str)
+@click.option("--order", type=int,
+              help='only pack the puzzles of this order, for files that mix orders')
+def pack(source: str, target: str, order: Optional[int]) -> None:
+    'writes the puzzles of a YAML or one-per-line file to a packed file'
+    import sudoku
+    puzzles = sudoku.iter_puzzles(source)
+    if order is not None:
+        puzzles = (zero_rows for zero_rows in puzzles if order_of(zero_rows) == order)
+    count = write(target, puzzles)
+    click.echo('packed %d puzzles' % count, err=True)
+
+@main.command()
+@click.argument("source", type=str)
+@click.option("--range", "puzzle_range", type=str, default=':',
+              help='only puzzles START:STOP (zero based, STOP excluded)')
+@click.option("--output", type=str, default='-',
+              help='where to write the puzzles, one per line (default stdout)')
+def unpack(source: str, puzzle_range: str, output: str) -> None:
+    'writes the puzzles of a packed file one per line'
+    import sudoku
+    start, stop = sudoku.parse_range(puzzle_range)
+    with Reader(source) as reader, click.open_file(output, 'w') as fobj:
+        for zero_rows in reader.iter(start, stop):
+            fobj.write(sudoku.zero_rows_to_line(zero_rows) + '\n')
+
+if __name__ == '__main__':
+    main()
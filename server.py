@@ -0,0 +1,419 @@
+'''
+server.py
+
+A local HTTP/JSON endpoint for the Sudoku solver, for other services to
+call instead of the command line.
+
+    POST /solve     a puzzle object, {"dot_rows": [...]} or
+                    {"zero_rows": [[...], ...]}, optionally with
+                    "max_solutions" (1 .. MAX_SOLUTIONS, default 1) and
+                    "timeout" (seconds, at most the server's --timeout);
+                    or {"puzzles": [...]} with a list of puzzle objects,
+                    answered with {"results": [...]} in the same order
+    GET  /health    {"status": "ok"} along with the server's counters
+
+The answer for a puzzle is an object with its status, 'solved',
+'no_solution', 'timeout' or 'invalid', the solutions found, in the
+shape the puzzle was given in, and the nodes and seconds of its search.
+A single invalid puzzle is answered with status 400 and an "error";
+in a list it only makes its own result 'invalid'.
+
+The searches run on a pool of worker processes. Puzzles that arrive
+within --batch-delay of each other are sent to the pool together, up to
+--batch-size at a time, so a stream of easy puzzles does not pay an
+inter-process round trip each, and at most --max-concurrent requests
+are worked on at once while the others wait for a slot. Each puzzle
+has a deadline, its timeout from the moment the request arrived: a
+search still running at its deadline is stopped inside the worker (see
+_DeadlineStats) instead of keeping the process busy, and a puzzle whose
+deadline passes before it reaches a worker is not searched at all.
+
+Only the standard library is needed besides the solver's own modules,
+and the server listens on 127.0.0.1 unless told otherwise.
+'''
+
+import asyncio
+import functools
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple
+import click
+import dlx
+import sudoku
+
+Puzzle = List[List[int]]                    # pylint: disable=invalid-name
+Result = Dict[str, Any]                     # pylint: disable=invalid-name
+Job = Tuple[Puzzle, int, float]             # zero_rows, max_solutions, deadline
+
+MAX_SOLUTIONS = 100
+MAX_BODY = 16 * 1024 * 1024
+READ_TIMEOUT = 10.0   # seconds for a client to send its request
+GRACE = 1.0           # seconds past a deadline before a worker is given up on
+
+class _DeadlineExpired(Exception):
+    'Exception thrown by _DeadlineStats when a search runs out of time'
+
+class _DeadlineStats(dlx.SearchStats):
+    '''
+    Search counters that also stop the search at a deadline, a
+    time.time() value: the clock is read every CHECK_EVERY nodes and
+    _DeadlineExpired is raised from inside the search once it is past.
+    The dlx searches work on copies of their matrix, so a search can
+    be abandoned like this at any node.
+    '''
+    CHECK_EVERY = 256
+
+    def __init__(self, deadline: float) -> None:
+        dlx.SearchStats.__init__(self)
+        self._deadline = deadline
+        self._countdown = self.CHECK_EVERY
+
+    def choose(self, depth: int, size: int) -> None:
+        dlx.SearchStats.choose(self, depth, size)
+        self._countdown -= 1
+        if not self._countdown:
+            self._countdown = self.CHECK_EVERY
+            if time.time() > self._deadline:
+                raise _DeadlineExpired()
+
+def _solve_job(job: Job, engine: str) -> Result:
+    # runs in a worker: the result of a puzzle, solutions as zero rows
+    zero_rows, max_solutions, deadline = job
+    if time.time() > deadline:
+        return {'status': 'timeout', 'solutions': [], 'nodes': 0, 'seconds': 0.0}
+    stats = _DeadlineStats(deadline)
+    try:
+        solutions = sudoku.solve(zero_rows, max_solutions, stats, engine)
+        status = 'solved' if solutions else 'no_solution'
+    except _DeadlineExpired:
+        solutions = []
+        status = 'timeout'
+    return {'status': status, 'solutions': solutions,
+            'nodes': sum(stats.nodes), 'seconds': round(stats.elapsed, 6)}
+
+def _solve_batch(jobs: List[Job], engine: str) -> List[Result]:
+    'the results of a batch of puzzles, for the pool to run'
+    return [_solve_job(job, engine) for job in jobs]
+
+def parse_puzzle(entry: Any) -> Tuple[Puzzle, bool]:
+    '''
+    The zero rows of a puzzle object of a request and whether it was
+    given as dot_rows. A ValueError is raised for anything that is not
+    a puzzle of order 2 .. 6.
+    '''
+    if not isinstance(entry, dict):
+        raise ValueError('a puzzle is an object with dot_rows or zero_rows')
+    if 'dot_rows' in entry:
+        rows = entry['dot_rows']
+        if not isinstance(rows, list) or not all(isinstance(row, str) for row in rows):
+            raise ValueError('dot_rows must be a list of strings')
+    elif 'zero_rows' in entry:
+        rows = entry['zero_rows']
+        if not isinstance(rows, list) or not all(isinstance(row, list) for row in rows):
+            raise ValueError('zero_rows must be a list of lists of integers')
+    else:
+        raise ValueError('a puzzle is an object with dot_rows or zero_rows')
+    n2 = len(rows)
+    order = int(round(n2 ** 0.5))
+    if order * order != n2 or not 2 <= order <= 6:
+        raise ValueError('a puzzle has 4, 9, 16, 25 or 36 rows, not %d' % n2)
+    if any(len(row) != n2 for row in rows):
+        raise ValueError('every row of a puzzle with %d rows has %d cells' % (n2, n2))
+    if 'dot_rows' in entry:
+        indices = sudoku.get_indices(order)
+        try:
+            zero_rows = [[indices[symbol] for symbol in row] for row in rows]
+        except KeyError as error:
+            raise ValueError('%r is not a symbol of a puzzle of order %d'
+                             % (error.args[0], order))
+    else:
+        zero_rows = rows
+    for row in zero_rows:
+        for value in row:
+            if type(value) is not int or not 0 <= value <= n2: # pylint: disable=unidiomatic-typecheck
+                raise ValueError('%r is not a value of a puzzle of order %d'
+                                 % (value, order))
+    return zero_rows, 'dot_rows' in entry
+
+class _HttpError(Exception):
+    'Exception thrown while handling a request, answered with its status'
+    def __init__(self, status: int, message: str) -> None:
+        Exception.__init__(self, message)
+        self.status = status
+
+class _Batcher(object):
+    '''
+    Hands the puzzles of all requests to the pool in batches: the first
+    puzzle of a batch waits batch_delay seconds for others to join it,
+    unless batch_size of them are queued already. The batcher does not
+    wait for a batch to come back before starting the next, so all the
+    workers of the pool are kept busy.
+    '''
+    def __init__(self,
+                 executor: ProcessPoolExecutor,
+                 engine: str,
+                 batch_size: int,
+                 batch_delay: float) -> None:
+        self._executor = executor
+        self._solve_batch = functools.partial(_solve_batch, engine=engine)
+        self._batch_size = batch_size
+        self._batch_delay = batch_delay
+        self._queue = asyncio.Queue() # type: asyncio.Queue
+
+    async def solve(self, job: Job) -> Result:
+        'the result of a puzzle, once its batch is done'
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((job, future))
+        return await future
+
+    async def run(self) -> None:
+        'sends the queued puzzles to the pool until cancelled'
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            if self._batch_delay > 0 and self._queue.qsize() < self._batch_size - 1:
+                await asyncio.sleep(self._batch_delay)
+            while len(items) < self._batch_size and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            # the puzzles of requests that gave up are not sent
+            items = [(job, future) for job, future in items if not future.done()]
+            if items:
+                batch = loop.run_in_executor(self._executor, self._solve_batch,
+                                             [job for job, _ in items])
+                batch.add_done_callback(functools.partial(_deliver, items))
+
+def _deliver(items: List[Tuple[Job, asyncio.Future]], batch: asyncio.Future) -> None:
+    # passes the results (or the failure) of a batch on to its puzzles
+    if batch.cancelled():
+        results = None # type: Optional[List[Result]]
+        error = asyncio.CancelledError() # type: Optional[BaseException]
+    else:
+        error = batch.exception()
+        results = None if error is not None else batch.result()
+    for i, (_, future) in enumerate(items):
+        if future.done():
+            continue
+        if results is None:
+            future.set_exception(error)
+        else:
+            future.set_result(results[i])
+
+class SolveServer(object): # pylint: disable=too-many-instance-attributes
+    '''
+    The solve service, see the module description. start() opens the
+    pool and starts listening, close() stops both.
+    '''
+    def __init__(self, # pylint: disable=too-many-arguments
+                 processes: int = 1,
+                 engine: str = 'array',
+                 batch_size: int = 16,
+                 batch_delay: float = 0.002,
+                 max_concurrent: int = 64,
+                 timeout: float = 10.0) -> None:
+        self.processes = processes
+        self.engine = engine
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self.counters = {'requests': 0, 'puzzles': 0, 'timeouts': 0, 'errors': 0}
+        self._slots = None # type: Optional[asyncio.Semaphore]
+        self._executor = None # type: Optional[ProcessPoolExecutor]
+        self._batcher_task = None # type: Optional[asyncio.Task]
+        self._batcher = None # type: Optional[_Batcher]
+        self._server = None # type: Optional[asyncio.AbstractServer]
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8000) -> None:
+        'opens the pool and listens on host:port (port 0 picks a free one)'
+        import multiprocessing
+        self.processes = self.processes or multiprocessing.cpu_count()
+        # the pool starts its workers when it is first given work, while
+        # connections are open; forked from this process they would hold
+        # on to those sockets (and the listening one), and a client would
+        # never see its connection closed. A forkserver or spawned worker
+        # starts from a clean process instead
+        method = ('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                  else 'spawn')
+        self._executor = ProcessPoolExecutor(self.processes,
+                                             mp_context=multiprocessing.get_context(method))
+        self._batcher = _Batcher(self._executor, self.engine, self.batch_size,
+                                 self.batch_delay)
+        self._batcher_task = asyncio.create_task(self._batcher.run())
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._server = await asyncio.start_server(self._handle, host, port)
+
+    @property
+    def port(self) -> int:
+        'the port the server listens on'
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        'serves requests until cancelled'
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        'stops listening and shuts the pool down, cancelling queued batches'
+        self._server.close()
+        await self._server.wait_closed()
+        self._batcher_task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle(self,
+                      reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        # one request per connection
+        try:
+            try:
+                method, path, body = await asyncio.wait_for(_read_request(reader),
+                                                            READ_TIMEOUT)
+                status, answer = await self._route(method, path, body)
+            except _HttpError as error:
+                self.counters['errors'] += 1
+                status, answer = error.status, {'error': str(error)}
+            except asyncio.TimeoutError:
+                status, answer = HTTPStatus.REQUEST_TIMEOUT, {'error': 'request not received in time'}
+            except Exception as error: # pylint: disable=broad-except
+                # e.g. a worker process died and took the pool with it
+                self.counters['errors'] += 1
+                status, answer = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': repr(error)}
+            payload = json.dumps(answer).encode()
+            writer.write(b'HTTP/1.1 %d %s\r\n' % (status, HTTPStatus(status).phrase.encode()))
+            writer.write(b'Content-Type: application/json\r\n')
+            writer.write(b'Content-Length: %d\r\n' % len(payload))
+            writer.write(b'Connection: close\r\n\r\n')
+            writer.write(payload)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        if path == '/health':
+            if method != 'GET':
+                raise _HttpError(HTTPStatus.METHOD_NOT_ALLOWED, 'use GET for /health')
+            return HTTPStatus.OK, dict(self.counters, status='ok')
+        if path != '/solve':
+            raise _HttpError(HTTPStatus.NOT_FOUND, 'no such endpoint: %s' % path)
+        if method != 'POST':
+            raise _HttpError(HTTPStatus.METHOD_NOT_ALLOWED, 'use POST for /solve')
+        try:
+            request = json.loads(body)
+        except ValueError as error:
+            raise _HttpError(HTTPStatus.BAD_REQUEST, 'not JSON: %s' % error)
+        if not isinstance(request, dict):
+            raise _HttpError(HTTPStatus.BAD_REQUEST, 'the request must be a JSON object')
+        self.counters['requests'] += 1
+        if 'puzzles' in request:
+            entries = request['puzzles']
+            if not isinstance(entries, list):
+                raise _HttpError(HTTPStatus.BAD_REQUEST, 'puzzles must be a list')
+        else:
+            entries = [request]
+        start = time.time()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise _HttpError(HTTPStatus.SERVICE_UNAVAILABLE, 'too many requests')
+        try:
+            results = await asyncio.gather(*(self._solve_entry(entry, start)
+                                             for entry in entries))
+        finally:
+            self._slots.release()
+        if 'puzzles' in request:
+            return HTTPStatus.OK, {'results': results}
+        if results[0]['status'] == 'invalid':
+            raise _HttpError(HTTPStatus.BAD_REQUEST, results[0]['error'])
+        return HTTPStatus.OK, results[0]
+
+    async def _solve_entry(self, entry: Any, start: float) -> Result:
+        # the answer for one puzzle object of a request
+        try:
+            zero_rows, as_dot_rows = parse_puzzle(entry)
+            max_solutions = entry.get('max_solutions', 1)
+            if type(max_solutions) is not int or not 1 <= max_solutions <= MAX_SOLUTIONS: # pylint: disable=unidiomatic-typecheck
+                raise ValueError('max_solutions must be 1 .. %d' % MAX_SOLUTIONS)
+            timeout = entry.get('timeout', self.timeout)
+            if not isinstance(timeout, (int, float)) or timeout <= 0:
+                raise ValueError('timeout must be a positive number of seconds')
+        except ValueError as error:
+            return {'status': 'invalid', 'error': str(error)}
+        self.counters['puzzles'] += 1
+        deadline = start + min(timeout, self.timeout)
+        try:
+            result = await asyncio.wait_for(
+                self._batcher.solve((zero_rows, max_solutions, deadline)),
+                deadline - time.time() + GRACE)
+        except asyncio.TimeoutError:
+            result = {'status': 'timeout', 'solutions': [], 'nodes': 0, 'seconds': 0.0}
+        if result['status'] == 'timeout':
+            self.counters['timeouts'] += 1
+        if as_dot_rows:
+            result['solutions'] = [sudoku.zero_rows_to_dot_rows(solution)
+                                   for solution in result['solutions']]
+        return result
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+    # the method, path and body of an HTTP request
+    request_line = await reader.readline()
+    parts = request_line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise _HttpError(HTTPStatus.BAD_REQUEST, 'malformed request line')
+    method, path, _ = parts
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            try:
+                length = int(value.strip())
+            except ValueError:
+                raise _HttpError(HTTPStatus.BAD_REQUEST, 'bad Content-Length')
+    if length > MAX_BODY:
+        raise _HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                         'the body is limited to %d bytes' % MAX_BODY)
+    body = await reader.readexactly(length) if length > 0 else b''
+    return method, path.split('?', 1)[0], body
+
+async def _serve(server: SolveServer, host: str, port: int) -> None:
+    await server.start(host, port)
+    click.echo('solving on http://%s:%d with %d processes'
+               % (host, server.port, server.processes), err=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+@click.command()
+@click.option("--host", type=str, default='127.0.0.1', show_default=True)
+@click.option("--port", type=int, default=8000, show_default=True)
+@click.option("--processes", "-j", type=int, default=1, show_default=True,
+              help='worker processes (0: one per CPU)')
+@click.option("--engine", type=click.Choice(sorted(sudoku.ENGINES)), default='array',
+              show_default=True, help='exact cover engine')
+@click.option("--batch-size", type=int, default=16, show_default=True,
+              help='most puzzles sent to a worker at once')
+@click.option("--batch-delay", type=float, default=0.002, show_default=True,
+              help='seconds a puzzle waits for others to share its batch')
+@click.option("--max-concurrent", type=int, default=64, show_default=True,
+              help='requests worked on at once; the others wait')
+@click.option("--timeout", type=float, default=10.0, show_default=True,
+              help='seconds allowed per request, and the most a request may ask for')
+def main(host: str, port: int, processes: int, engine: str, # pylint: disable=too-many-arguments
+         batch_size: int, batch_delay: float, max_concurrent: int,
+         timeout: float) -> None:
+    'main entry point'
+    server = SolveServer(processes, engine, batch_size, batch_delay,
+                         max_concurrent, timeout)
+    try:
+        asyncio.run(_serve(server, host, port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    # pylint: disable=no-value-for-parameter
+    main()
@@ -0,0 +1,201 @@
+'''
+store.py
+
+A persistent store of solved puzzles, so that results survive restarts
+and a rerun over a large collection only searches the puzzles it has
+not seen.
+
+The store is an SQLite file with one row per puzzle, keyed by a 16 byte
+BLAKE2b hash of its order and its packed record (see packed.py), with
+
+    count           the number of solutions found
+    max_solutions   the most the search looked for (0: all of them), so
+                    count < max_solutions means there are no others
+    solutions       the packed records of the solutions, one after the
+                    other
+    nodes, seconds  the counters of the search (see dlx.SearchStats)
+
+Lookups and inserts take many puzzles at a time, one query per few
+hundred keys and one transaction per batch of inserts, so that going
+over a million stored puzzles costs little more than reading them.
+'''
+
+import collections
+import hashlib
+import itertools
+import sqlite3
+from typing import Iterable, Iterator, List, Optional, Tuple
+import dlx
+import packed
+import sudoku
+
+Puzzle = List[List[int]]                    # pylint: disable=invalid-name
+
+Entry = collections.namedtuple('Entry', 'solutions max_solutions nodes seconds')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS solutions (
+    key BLOB PRIMARY KEY,
+    grid_order INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    max_solutions INTEGER NOT NULL,
+    solutions BLOB NOT NULL,
+    nodes INTEGER,
+    seconds REAL
+) WITHOUT ROWID
+'''
+
+# keys per SELECT, well below SQLite's limit on query parameters
+_LOOKUP_CHUNK = 500
+# puzzles added between commits
+FLUSH_EVERY = 1000
+
+def get_key(zero_rows: Puzzle) -> bytes:
+    'the key of a puzzle: a hash of its order and its packed record'
+    order = packed.order_of(zero_rows)
+    return hashlib.blake2b(bytes([order]) + packed.encode(zero_rows),
+                           digest_size=16).digest()
+
+def _covers(entry: Entry, max_solutions: int) -> bool:
+    # True if the entry answers a search for max_solutions solutions
+    return (entry.max_solutions == 0 or len(entry.solutions) < entry.max_solutions
+            or 0 < max_solutions <= entry.max_solutions)
+
+class SolutionStore(object):
+    '''
+    The solutions of the puzzles solved so far, in an SQLite file that
+    is created if it does not exist yet. put(), put_many() and add()
+    replace what was stored for a puzzle; the changes are committed by
+    flush(), which put_many() calls itself and add() every FLUSH_EVERY
+    puzzles, and by close().
+
+    solve() has the signature of sudoku.solve and of
+    canon.SolutionCache.solve, so the store can stand in front of the
+    solver wherever a cache can.
+    '''
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+    def __len__(self) -> int:
+        return self._db.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+
+    def get(self, zero_rows: Puzzle) -> Optional[Entry]:
+        'the entry of a puzzle, None if it is not in the store'
+        return self.get_many([zero_rows])[0]
+
+    def get_many(self, puzzles: List[Puzzle]) -> List[Optional[Entry]]:
+        'the entries of the puzzles, in the same order, with a query per chunk of keys'
+        keys = [get_key(zero_rows) for zero_rows in puzzles]
+        rows = {}
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            chunk = keys[start:start + _LOOKUP_CHUNK]
+            rows.update((row[0], row[1:]) for row in self._db.execute(
+                'SELECT key, grid_order, count, max_solutions, solutions, nodes, seconds '
+                'FROM solutions WHERE key IN (%s)' % ','.join('?' * len(chunk)), chunk))
+        return [_to_entry(*rows[key]) if key in rows else None for key in keys]
+
+    def put(self, zero_rows: Puzzle, entry: Entry) -> None:
+        'stores the entry of a puzzle, to be committed by the next flush'
+        self._put(zero_rows, entry)
+
+    def put_many(self, items: Iterable[Tuple[Puzzle, Entry]]) -> None:
+        'stores the entries of many puzzles in one transaction'
+        for zero_rows, entry in items:
+            self._put(zero_rows, entry)
+        self.flush()
+
+    def add(self,
+            zero_rows: Puzzle,
+            solutions: List[Puzzle],
+            max_solutions: int,
+            stats: Optional[dlx.SearchStats] = None) -> None:
+        'stores the outcome of a search for max_solutions solutions of a puzzle'
+        self._put(zero_rows, Entry(solutions, max_solutions,
+                                   sum(stats.nodes) if stats is not None else None,
+                                   stats.elapsed if stats is not None else None))
+        if self._pending >= FLUSH_EVERY:
+            self.flush()
+
+    def _put(self, zero_rows: Puzzle, entry: Entry) -> None:
+        self._pending += 1
+        self._db.execute(
+            'INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (get_key(zero_rows), packed.order_of(zero_rows),
+             len(entry.solutions), entry.max_solutions,
+             b''.join(packed.encode(solution) for solution in entry.solutions),
+             entry.nodes, entry.seconds))
+
+    def flush(self) -> None:
+        'commits what has been stored'
+        self._db.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        'commits what has been stored and closes the file'
+        self._db.commit()
+        self._db.close()
+
+    def __enter__(self) -> 'SolutionStore':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def solve(self,
+              zero_rows: Puzzle,
+              max_solutions: int = 1,
+              stats: Optional[dlx.SearchStats] = None,
+              engine: str = 'array',
+              deduce: bool = False) -> List[Puzzle]:
+        '''
+        sudoku.solve through the store: a stored answer is used if it was
+        searched for at least max_solutions solutions or found them all,
+        otherwise the puzzle is solved and the answer stored and committed.
+        The puzzle is looked up and stored as given; with deduce=True it is
+        only deduced when it has to be solved
+        '''
+        entry = self.get(zero_rows)
+        if entry is not None and _covers(entry, max_solutions):
+            self.hits += 1
+            return entry.solutions[:max_solutions] if max_solutions else entry.solutions
+        self.misses += 1
+        search_stats = stats if stats is not None else dlx.SearchStats()
+        solutions = sudoku.solve(zero_rows, max_solutions, search_stats, engine, deduce)
+        self.add(zero_rows, solutions, max_solutions, search_stats)
+        self.flush()
+        return solutions
+
+    def lookup(self,
+               puzzles: Iterable[Puzzle],
+               max_solutions: int = 1,
+               chunk: int = 1000) -> Iterator[Tuple[Puzzle, Optional[Entry]]]:
+        '''
+        Yields each puzzle with its entry, or None when the store does not
+        answer a search for max_solutions solutions of it, looking the
+        puzzles up chunk at a time as they come
+        '''
+        puzzles = iter(puzzles)
+        while True:
+            batch = list(itertools.islice(puzzles, chunk))
+            if not batch:
+                return
+            for zero_rows, entry in zip(batch, self.get_many(batch)):
+                if entry is not None and not _covers(entry, max_solutions):
+                    entry = None
+                self.hits += entry is not None
+                self.misses += entry is None
+                yield zero_rows, entry
+
+def _to_entry(order: int, count: int, max_solutions: int, solutions: bytes,
+              nodes: Optional[int], seconds: Optional[float]) -> Entry:
+    size = packed.record_size(order)
+    return Entry([packed.decode(solutions[i * size:(i + 1) * size], order)
+                  for i in range(count)], max_solutions, nodes, seconds)
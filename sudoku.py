@@ -74,9 +74,8 @@ this \'pruning\' of the cover matrix. So here is the procedure
 '''
 
 import click
-from typing import List, Tuple, Iterator
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Iterator, Union
 import dlx
-from drawsudoku import draw_sudoku
 
 IValue = int
 IRow = int
@@ -85,8 +84,24 @@ IVRC = Tuple[IValue, IRow, IColumn]
 Order = int
 Puzzle = List[List[int]]                    # pylint: disable=invalid-name
 COLUMN_NAME = int                           # pylint: disable=invalid-name
+DlxRoot = Union[dlx.ArrayRoot, dlx.BitsetRoot]
 
-COUNT = 0 # count of the number of Sudoku solutions found
+# the exact cover engines that the pruned matrix of a puzzle can be
+# searched with: both visit the same nodes, so they can be compared
+# directly, see bench.py
+ENGINES = {
+    'array': dlx.ArrayRoot,
+    'bitset': dlx.BitsetRoot,
+}
+
+# the column choice of the searches, see dlx.HEURISTICS: 'buckets'
+# searches the same tree as 'min' without scanning every column left
+HEURISTIC = 'buckets'
+
+# pristine exact cover matrices, one per Sudoku order, see get_template
+_TEMPLATES = {} # type: Dict[Order, dlx.ArrayRoot]
+# Sudoku.get_column_table of each order, for Sudoku.get_pruned_root
+_COLUMN_TABLES = {} # type: Dict[Order, Any]
 
 def _get_chars(ch0: str, ch1: str) -> List[str]:
     return [chr(i) for i in range(ord(ch0), ord(ch1)+1)]
@@ -201,6 +216,20 @@ Zero row representation
         i_value = rem - self.N2 * i_col
         return i_value, i_row, i_col
 
+    def get_dlx_row(self, i_value: int, i_row: int, i_col: int) -> int:
+        'the inverse of _get_ivrc: the dlx matrix row for a value in a cell'
+        assert i_value >= 0 and i_value < self.N2
+        assert i_row >= 0 and i_row < self.N2
+        assert i_col >= 0 and i_col < self.N2
+        return i_value + self.N2 * (i_col + self.N2 * i_row)
+
+    def get_clue_rows(self, puzzle: Puzzle) -> List[int]:
+        'the dlx matrix rows of the initial values of a puzzle'
+        return [self.get_dlx_row(i_value - 1, i_row, i_col)
+                for i_row, row in enumerate(puzzle)
+                for i_col, i_value in enumerate(row)
+                if i_value > 0]
+
     def _get_bit_column_row(self, i_dlx: int) -> List[int]:
         'get a list of the occupied columns in the row of a dlx matrix'
         assert i_dlx >= 0 and i_dlx < self.N6
@@ -211,89 +240,553 @@ Zero row representation
         'get the full dlx matrix for Sudoku puzzles of this order'
         return [self._get_bit_column_row(i) for i in range(self.N6)]
 
-class MultipleSolutionsException(Exception):
-    'Exception thrown when more than one solution is encountered'
-    def __init__(self):
-        Exception.__init__(self)
+    def get_column_table(self) -> Any:
+        '''
+        The full dlx matrix as one flat table of column indices: row i_dlx
+        of get_set_bits() is table[4 * i_dlx: 4 * i_dlx + 4], for
+        dlx.ArrayRoot.from_table. From order 4 on it is built for all the
+        rows at once as a NumPy array, if NumPy is installed; otherwise,
+        and for the small orders where importing NumPy would take longer
+        than the loop, it is an array('i').
+        '''
+        if self.N < 4:
+            return self._get_column_table_python()
+        try:
+            import numpy
+        except ImportError:
+            return self._get_column_table_python()
+        N, N2, N4 = self.N, self.N2, self.N4
+        i_dlx = numpy.arange(self.N6, dtype=numpy.intc)
+        i_row = i_dlx // N4
+        i_col = i_dlx // N2 % N2
+        i_value = i_dlx % N2
+        i_box = i_col // N + N * (i_row // N)
+        table = numpy.empty((self.N6, 4), dtype=numpy.intc)
+        table[:, 0] = i_col + N2 * i_row
+        table[:, 1] = i_value + N2 * (i_row + N2 * 1)
+        table[:, 2] = i_value + N2 * (i_col + N2 * 2)
+        table[:, 3] = i_value + N2 * (i_box + N2 * 3)
+        return table.ravel()
 
-# pylint: disable=too-many-locals, too-many-branches
-def solve_zero_rows(zero_rows: Puzzle) -> None:
-    ''''
-    Solving a Sudoku puzzle represented as a zero base list of integer lists
+    def _get_column_table_python(self) -> Any:
+        'get_column_table without NumPy'
+        from array import array
+        N, N2 = self.N, self.N2
+        table = array('i')
+        for i_row in range(N2):
+            for i_col in range(N2):
+                j_e = i_col + N2 * i_row
+                i_box = i_col // N + N * (i_row // N)
+                for i_value in range(N2):
+                    table.extend((j_e,
+                                  i_value + N2 * (i_row + N2 * 1),
+                                  i_value + N2 * (i_col + N2 * 2),
+                                  i_value + N2 * (i_box + N2 * 3)))
+        return table
+
+    def get_pruned_root(self,
+                        puzzle: Puzzle,
+                        exclude: Iterable[int] = (),
+                        engine: str = 'array') -> DlxRoot:
+        '''
+        The exact cover matrix of a puzzle, built only from what is left
+        once its initial values are in place: the rows of the values
+        that can still go into the empty cells and the columns that the
+        initial values have not covered. Searching it is the same as
+        searching a copy of get_template(order) on which the rows of the
+        initial values have been selected, but there is nothing to copy
+        or cover, and a sparse matrix takes far less memory than the full
+        one. The column names are those of the full matrix, so the
+        solutions decode the same way. The dlx rows in exclude (see
+        get_dlx_row) are left out as well. The matrix is built for the
+        engine of that name in ENGINES.
+
+        A dlx.ConflictError is raised if two initial values share a row,
+        column or box.
+        '''
+        if self.N < 4:
+            names, table = self._get_pruned_table_python(puzzle, exclude)
+        else:
+            try:
+                names, table = self._get_pruned_table_numpy(puzzle, exclude)
+            except ImportError:
+                names, table = self._get_pruned_table_python(puzzle, exclude)
+        return ENGINES[engine].from_table(names, table, 4)
+
+    def _get_pruned_table_python(self, puzzle: Puzzle, exclude: Iterable[int]):
+        '''
+        the column names and the flat column table (of indices into the
+        names) for get_pruned_root
+        '''
+        from array import array
+        N, N2, N4 = self.N, self.N2, self.N4
+        boxes = [[i_col // N + N * (i_row // N) for i_col in range(N2)]
+                 for i_row in range(N2)]
+        # bit i_value of each mask: the value is in the row, column or box
+        rows, cols, boxs = [0] * N2, [0] * N2, [0] * N2
+        for i_row, row in enumerate(puzzle):
+            for i_col, value in enumerate(row):
+                if value:
+                    bit = 1 << (value - 1)
+                    i_box = boxes[i_row][i_col]
+                    if (rows[i_row] | cols[i_col] | boxs[i_box]) & bit:
+                        raise dlx.ConflictError(self.get_dlx_row(value - 1, i_row, i_col))
+                    rows[i_row] |= bit
+                    cols[i_col] |= bit
+                    boxs[i_box] |= bit
+        # the new index of each column that is left, -1 for the others
+        index = [-1] * (4 * N4)
+        names = [] # type: List[int]
+        def keep(j_dlx: int) -> None:
+            index[j_dlx] = len(names)
+            names.append(j_dlx)
+        for i_row, row in enumerate(puzzle):
+            for i_col, value in enumerate(row):
+                if not value:
+                    keep(i_col + N2 * i_row)
+        for offset, masks in enumerate((rows, cols, boxs)):
+            for i_unit, mask in enumerate(masks):
+                for i_value in range(N2):
+                    if not mask >> i_value & 1:
+                        keep(i_value + N2 * (i_unit + N2 * (offset + 1)))
+        excluded = set(exclude)
+        table = array('i')
+        for i_row, row in enumerate(puzzle):
+            for i_col, value in enumerate(row):
+                if value:
+                    continue
+                i_box = boxes[i_row][i_col]
+                used = rows[i_row] | cols[i_col] | boxs[i_box]
+                j_e = index[i_col + N2 * i_row]
+                for i_value in range(N2):
+                    if used >> i_value & 1 or (
+                            excluded and self.get_dlx_row(i_value, i_row, i_col) in excluded):
+                        continue
+                    table.extend((j_e,
+                                  index[i_value + N2 * (i_row + N2 * 1)],
+                                  index[i_value + N2 * (i_col + N2 * 2)],
+                                  index[i_value + N2 * (i_box + N2 * 3)]))
+        return names, table
+
+    def _get_pruned_table_numpy(self, puzzle: Puzzle, exclude: Iterable[int]):
+        '''
+        _get_pruned_table_python with whole-array operations, using the
+        rows of get_column_table, which is computed once per order
+        '''
+        import numpy
+        N, N2 = self.N, self.N2
+        values = numpy.array(puzzle, dtype=numpy.intc).reshape(N2, N2)
+        filled = values > 0
+        # counts[i_row, i_col, i_value]: 1 where the value is given
+        counts = numpy.zeros((N2, N2, N2), dtype=numpy.intc)
+        i_rows, i_cols = numpy.nonzero(filled)
+        counts[i_rows, i_cols, values[filled] - 1] = 1
+        in_row = counts.sum(axis=1)
+        in_col = counts.sum(axis=0)
+        in_box = counts.reshape(N, N, N, N, N2).sum(axis=(1, 3)).reshape(N2, N2)
+        boxes = (numpy.arange(N2)[:, None] // N) * N + numpy.arange(N2)[None, :] // N
+        # (values - 1 of an empty cell is -1, a valid index, but masked)
+        clashes = filled & ((in_row[numpy.arange(N2)[:, None], values - 1] > 1)
+                            | (in_col[numpy.arange(N2)[None, :], values - 1] > 1)
+                            | (in_box[boxes, values - 1] > 1))
+        if clashes.any():
+            i_row, i_col = [int(i[0]) for i in numpy.nonzero(clashes)]
+            raise dlx.ConflictError(self.get_dlx_row(int(values[i_row, i_col]) - 1,
+                                                     i_row, i_col))
+        used = in_row[:, None, :] | in_col[None, :, :] | in_box[boxes]
+        kept_rows = (~filled[:, :, None] & (used == 0)).ravel()
+        excluded = list(exclude)
+        if excluded:
+            kept_rows[excluded] = False
+        left = ~numpy.concatenate([filled.ravel(), in_row.ravel() > 0,
+                                   in_col.ravel() > 0, in_box.ravel() > 0])
+        index = numpy.cumsum(left, dtype=numpy.intc) - 1
+        table = numpy.asarray(_get_column_table(self.N)).reshape(self.N6, 4)[kept_rows]
+        return numpy.nonzero(left)[0].tolist(), index[table].ravel()
+
+def _get_column_table(order: Order) -> Any:
+    'Sudoku.get_column_table, cached'
+    table = _COLUMN_TABLES.get(order)
+    if table is None:
+        table = _COLUMN_TABLES[order] = Sudoku(order, []).get_column_table()
+    return table
+
+def get_template(order: Order) -> dlx.ArrayRoot:
     '''
-    import math
-    order = int(math.sqrt(len(zero_rows)))
+    Returns the exact cover matrix for Sudoku puzzles of the given order
+    with no columns covered. The matrix depends only on the order so it
+    is built once per process and cached; copy() it before covering
+    the columns of a puzzle's initial values.
+    '''
+    template = _TEMPLATES.get(order)
+    if template is None:
+        sudoku = Sudoku(order, [])
+        column_names = list(range(sudoku.n_dlx_columns))
+        template = dlx.ArrayRoot.from_table(column_names, sudoku.get_column_table(), 4)
+        _TEMPLATES[order] = template
+    return template
+
+def clear_caches() -> None:
+    'forgets the matrices and column tables built so far, of every order'
+    _TEMPLATES.clear()
+    _COLUMN_TABLES.clear()
+
+def _get_labels(order: Order) -> List[str]:
+    'the symbols drawn for the values 0 .. order^2 of a puzzle'
     if order == 4:
-        labels = ['X',
-                  '0', '1', '2', '3',
-                  '4', '5', '6', '7',
-                  '8', '9', 'A', 'B',
-                  'C', 'D', 'E', 'F']
+        return ['X',
+                '0', '1', '2', '3',
+                '4', '5', '6', '7',
+                '8', '9', 'A', 'B',
+                'C', 'D', 'E', 'F']
     elif order == 5:
-        labels = [c for (c, _) in _order5_isomorphisms]
+        return [c for (c, _) in _order5_isomorphisms]
     elif order == 6:
-        labels = [c for (c, _) in _order6_isomorphisms]
-    else:
-        labels = ['X', '1', '2', '3', '4', '5', '6', '7', '8', '9']
+        return [c for (c, _) in _order6_isomorphisms]
+    return ['X', '1', '2', '3', '4', '5', '6', '7', '8', '9']
+
+def _decode_solution(n2: int,
+                     name_lists: Iterator[List[COLUMN_NAME]],
+                     solution: Puzzle) -> None:
+    'writes the values of the rows chosen by the dlx search into solution'
+    for names in name_lists:
+        names.sort()
+        j_e = names[0]
+        j_r = names[1]
+        i_row = j_e // n2
+        i_col = j_e - n2 * i_row
+        i_value = j_r - n2 * (i_row + n2 * 1)
+        solution[i_row][i_col] = i_value + 1
+
+def solve(zero_rows: Puzzle,
+          max_solutions: int = 1,
+          stats: Optional[dlx.SearchStats] = None,
+          engine: str = 'array',
+          deduce: bool = False) -> List[Puzzle]:
+    '''
+    Solves a Sudoku puzzle represented as a zero base list of integer
+    lists and returns up to max_solutions of its solutions (every one of
+    them when max_solutions is 0) as complete grids of the values
+    1 .. order^2. An empty list means that the puzzle has no solution.
+
+    Nothing is drawn or printed and all the state is local to the call,
+    so this can be called any number of times in the same process. The
+    search counters are collected in stats if one is given; it is left
+    untouched when the initial values conflict. engine names the exact
+    cover engine to search with, see ENGINES.
+
+    With deduce=True the cells that deduction forces (see logic.deduce)
+    are filled first and only the rest is searched; a puzzle that
+    deduction solves, or finds to have no solution, is not searched at
+    all and leaves stats untouched.
+    '''
+    import math
+    if deduce:
+        import logic
+        try:
+            zero_rows = logic.deduce(zero_rows)[0]
+        except logic.Contradiction:
+            return []
+        if logic.is_complete(zero_rows):
+            return [zero_rows]
+    order = int(math.sqrt(len(zero_rows)))
     sudoku = Sudoku(order, zero_rows)
-    set_bits = sudoku.get_set_bits()
-    column_names = list(range(sudoku.n_dlx_columns))
-    root = dlx.Root(column_names, set_bits)
-
-    # cover the columns already accounted for in the initial state of
-    # the Sudoku puzzle. If the constraint is already satisfied, then
-    # cover the column corresponding to the constraint
-    for i_row, row in enumerate(zero_rows):
-        for i_col, i_value in enumerate(row):
-            i_value -= 1
-            if i_value < 0:
-                continue
-            column_names = sudoku.get_bit_column_row_ex(i_value, i_row, i_col)
-            for column_name in column_names:
-                # search for the column in the current dlx matrix
-                # it may have been deleted by a previous call to cover
-                for column in root.get_columns():
-                    if column.name == column_name:
-                        column.cover()
-
-    # zero out the representation of the solution which is an
-    # N^2 bo N^2 matrix
-    solution = []
-    for i_row in range(sudoku.N2):
-        solution.append([0] * sudoku.N2)
+
+    # the matrix is built from the rows and columns that the initial
+    # values leave, see Sudoku.get_pruned_root. Initial values that break
+    # a constraint between themselves are caught here, before any search
+    try:
+        root = sudoku.get_pruned_root(zero_rows, engine=engine)
+    except dlx.ConflictError:
+        return []
+
+    solutions = [] # type: List[Puzzle]
 
     def bcaster(name_lists: Iterator[List[COLUMN_NAME]]) -> None:
         '''
         callback for the dancing links search function
-        Each time this is called it adds a value to
-        \'solution\' (the Sudoku solution matrix)
+        Each time this is called it completes a copy of the puzzle
+        with the values of the solution
         '''
+        solution = [list(row) for row in zero_rows]
+        _decode_solution(sudoku.N2, name_lists, solution)
+        solutions.append(solution)
 
-        global COUNT                # pylint: disable=global-statement
-        if COUNT > 0:
-            raise MultipleSolutionsException()
-        COUNT += 1
-        for names in name_lists:
-            names.sort()
-            j_e = names[0]
-            j_r = names[1]
-            N2 = sudoku.N2           # pylint: disable=invalid-name
-
-            i_row = j_e // N2
-            i_col = j_e - N2 * i_row
-            i_value = j_r - N2 * (i_row + N2 * 1)
-            solution[i_row][i_col] = i_value + 1
-        draw_sudoku(zero_rows, solution, order, labels)
+    root.search(bcaster=bcaster, stats=stats, max_solutions=max_solutions,
+                heuristic=HEURISTIC)
+    return solutions
 
+def count_solutions(zero_rows: Puzzle, limit: int = 2, engine: str = 'array') -> int:
+    '''
+    The number of solutions of a Sudoku puzzle in the zero row
+    representation, counting no further than limit (unless it is 0).
+    With the default limit 2 this is a uniqueness check: 0 means no
+    solution, 1 a unique one and 2 more than one. No solution grids
+    are built, so it is cheaper than solve(zero_rows, limit).
+    '''
+    import math
+    order = int(math.sqrt(len(zero_rows)))
     try:
-        root.search(bcaster=bcaster)
-    except MultipleSolutionsException:
-        print("More that one solution has been found .. printing one")
+        root = Sudoku(order, zero_rows).get_pruned_root(zero_rows, engine=engine)
+    except dlx.ConflictError:
+        return 0
+    return root.search(None, max_solutions=limit, heuristic=HEURISTIC)
 
-    if COUNT == 0:
+def solve_zero_rows(zero_rows: Puzzle,
+                    processes: int = 1,
+                    draw: bool = True,
+                    stats: bool = False,
+                    engine: str = 'array',
+                    cache: Any = None,
+                    deduce: bool = False) -> None:
+    ''''
+    Solving a Sudoku puzzle represented as a zero base list of integer lists
+    and drawing the solution
+
+    With processes other than 1 the search tree is split over a pool of
+    worker processes, see solve_parallel. With draw=False the solution
+    is printed as dot rows instead, and the graphics modules (and with
+    them Tk and a display) are never loaded. With stats=True the search
+    counters (see dlx.SearchStats) are reported on stderr; they are only
+    collected when the search runs in this process, as is the choice of
+    engine (see ENGINES). So is a canon.SolutionCache given as cache: the
+    puzzle is only searched if neither it nor an equivalent one is in it;
+    a store.SolutionStore can be given as cache too.
+
+    With deduce=True the cells that deduction forces (see logic.deduce)
+    are filled first, and the techniques it used are reported with the
+    counters; the rest of the puzzle is solved as above, if anything is
+    left of it. A cache is still looked up and filled with the puzzle as
+    given: it only deduces a puzzle that is not in it, and the techniques
+    are not reported then.
+    '''
+    import math
+    order = int(math.sqrt(len(zero_rows)))
+    puzzle = zero_rows
+    deduce_here = deduce and (cache is None or processes != 1)
+    if deduce_here:
+        import logic
+        try:
+            puzzle, counts = logic.deduce(zero_rows)
+        except logic.Contradiction:
+            print("No Solutions")
+            return
+        if stats:
+            click.echo('deduced %d cells: %s' % (
+                sum(not z for row in zero_rows for z in row)
+                - sum(not p for row in puzzle for p in row),
+                ', '.join('%s %d' % (name, count)
+                          for name, count in counts.items() if count) or 'nothing'),
+                       err=True)
+    if deduce_here and logic.is_complete(puzzle):
+        count, solution = 1, puzzle
+    elif processes == 1:
+        search_stats = dlx.SearchStats() if stats else None
+        if cache is not None:
+            hits = cache.hits
+            solutions = cache.solve(puzzle, max_solutions=2, stats=search_stats,
+                                    engine=engine, deduce=deduce)
+            if cache.hits > hits:
+                search_stats = None
+                if stats:
+                    click.echo('no search: the solutions were found before', err=True)
+        else:
+            solutions = solve(puzzle, max_solutions=2, stats=search_stats,
+                              engine=engine)
+        if search_stats is not None:
+            click.echo(search_stats.report(), err=True)
+        count = len(solutions)
+        solution = solutions[0] if solutions else None
+    else:
+        if stats:
+            click.echo('no search counters for a parallel search', err=True)
+        count, solution = solve_parallel(puzzle, processes, max_solutions=2)
+    if solution is None:
         print("No Solutions")
+        return
+    if count > 1:
+        print("More that one solution has been found .. printing one")
+    if not draw:
+        for dot_row in zero_rows_to_dot_rows(solution):
+            print(dot_row)
+        return
+    # graphics creates its Tk root when imported, so only import it here
+    from drawsudoku import draw_sudoku
+    # only the cells that were blank are drawn as the solution
+    solution = [[0 if z else s for z, s in zip(z_row, s_row)]
+                for z_row, s_row in zip(zero_rows, solution)]
+    draw_sudoku(zero_rows, solution, order, _get_labels(order))
+
+def _solve_first(zero_rows: Puzzle,
+                 engine: str = 'array',
+                 deduce: bool = False) -> Optional[Puzzle]:
+    'the first solution of solve(), or None, for pools to map over'
+    solutions = solve(zero_rows, engine=engine, deduce=deduce)
+    return solutions[0] if solutions else None
+
+def _solve_first_stats(zero_rows: Puzzle,
+                       engine: str = 'array',
+                       deduce: bool = False
+                      ) -> Tuple[Optional[Puzzle], dlx.SearchStats]:
+    'like _solve_first, along with the counters of the search'
+    stats = dlx.SearchStats()
+    solutions = solve(zero_rows, stats=stats, engine=engine, deduce=deduce)
+    return (solutions[0] if solutions else None), stats
+
+def solve_many(puzzles: Iterable[Puzzle],
+               processes: int = 1,
+               chunksize: int = 0,
+               engine: str = 'array',
+               deduce: bool = False) -> Iterator[Optional[Puzzle]]:
+    '''
+    Solves puzzles given in the zero row representation one after the
+    other and yields, in the same order, the first solution found for
+    each (with the initial values filled in) or None for a puzzle with
+    no solution. Nothing is drawn.
+
+    Each puzzle is searched on its own pruned matrix (see
+    Sudoku.get_pruned_root) with the engine of that name in ENGINES,
+    after the cells that deduction forces are filled if deduce is True.
 
-def _get_indices(order: int):
+    With processes > 1 (or 0 for one process per CPU) the puzzles are
+    spread over a pool of worker processes. Each worker builds its own
+    templates the first time it meets an order, and puzzles are sent to
+    the workers chunksize at a time to amortize the inter-process
+    traffic; chunksize 0 picks a size from the number of puzzles.
+    '''
+    import functools
+    return map_puzzles(functools.partial(_solve_first, engine=engine, deduce=deduce),
+                        puzzles, processes, chunksize)
+
+def solve_many_stats(puzzles: Iterable[Puzzle],
+                     processes: int = 1,
+                     chunksize: int = 0,
+                     engine: str = 'array',
+                     deduce: bool = False
+                    ) -> Iterator[Tuple[Optional[Puzzle], dlx.SearchStats]]:
+    '''
+    Like solve_many, but yields the counters of each search (see
+    dlx.SearchStats) along with its solution
+    '''
+    import functools
+    return map_puzzles(functools.partial(_solve_first_stats, engine=engine, deduce=deduce),
+                        puzzles, processes, chunksize)
+
+def map_puzzles(func: Callable[[Puzzle], Any],
+                puzzles: Iterable[Puzzle],
+                processes: int,
+                chunksize: int) -> Iterator[Any]:
+    '''
+    Yields func of each puzzle, in the order of the puzzles, on a pool
+    of processes worker processes unless processes is 1; func must be
+    picklable. The puzzles are streamed in chunks as in solve_many.
+    '''
+    if processes == 1:
+        for zero_rows in puzzles:
+            yield func(zero_rows)
+        return
+    import collections
+    import itertools
+    import multiprocessing
+    processes = processes or multiprocessing.cpu_count()
+    if not chunksize:
+        # four chunks per worker, as multiprocessing.Pool.map does
+        try:
+            chunksize = max(1, len(puzzles) // (4 * processes)) # type: ignore
+        except TypeError:
+            chunksize = 8
+    # Pool.imap would read all of puzzles up front, so the chunks are
+    # submitted by hand and only a few per worker are kept in flight:
+    # the puzzles are read as the workers solve and memory stays bounded
+    puzzles = iter(puzzles)
+    pending = collections.deque() # type: Any
+    with multiprocessing.Pool(processes) as pool:
+        while True:
+            chunk = list(itertools.islice(puzzles, chunksize))
+            if chunk:
+                pending.append(pool.apply_async(_map_chunk, ((func, chunk),)))
+            if pending and (not chunk or len(pending) >= 4 * processes):
+                for result in pending.popleft().get():
+                    yield result
+            elif not chunk:
+                return
+
+def _map_chunk(args: Tuple[Callable[[Puzzle], Any], List[Puzzle]]) -> List[Any]:
+    'func of each puzzle of a chunk, for map_puzzles to submit to a pool'
+    func, chunk = args
+    return [func(zero_rows) for zero_rows in chunk]
+
+def _solve_subtree(args: Tuple[Puzzle, List[int], int]
+                  ) -> Tuple[int, Optional[Puzzle]]:
+    '''
+    Worker for solve_parallel: searches the subproblem given by the rows
+    of a split and returns the number of solutions found (at most
+    max_solutions, unless that is 0) and the first of them
+    '''
+    zero_rows, prefix, max_solutions = args
+    import math
+    order = int(math.sqrt(len(zero_rows)))
+    sudoku = Sudoku(order, zero_rows)
+    root = get_template(order).copy()
+    root.select_rows(sudoku.get_clue_rows(zero_rows) + prefix)
+    first = [list(row) for row in zero_rows]
+    for i_dlx in prefix:
+        i_value, i_row, i_col = sudoku._get_ivrc(i_dlx) # pylint: disable=protected-access
+        first[i_row][i_col] = i_value + 1
+    decoded = False
+
+    def bcaster(name_lists: Iterator[List[COLUMN_NAME]]) -> None:
+        'callback for the dancing links search function'
+        nonlocal decoded
+        if not decoded:
+            _decode_solution(sudoku.N2, name_lists, first)
+            decoded = True
+
+    n_found = root.search(bcaster=bcaster, max_solutions=max_solutions,
+                          heuristic=HEURISTIC)
+    return n_found, (first if n_found else None)
+
+def solve_parallel(zero_rows: Puzzle,
+                   processes: int = 0,
+                   depth: int = 3,
+                   max_solutions: int = 1) -> Tuple[int, Optional[Puzzle]]:
+    '''
+    Solves a single (hard) puzzle by searching disjoint parts of its
+    search tree on a pool of worker processes (0 for one per CPU).
+
+    The first 'depth' levels of the tree are expanded into subproblems,
+    see dlx.ArrayRoot.split, and the workers search them in parallel.
+    The counts of the workers are merged and, as soon as max_solutions
+    solutions are known, the pool is terminated so the remaining
+    searches are cancelled; max_solutions = 0 counts every solution.
+
+    Returns the number of solutions found and the first one received
+    (with the initial values filled in), or (0, None).
+    '''
+    import math
+    import multiprocessing
+    order = int(math.sqrt(len(zero_rows)))
+    sudoku = Sudoku(order, zero_rows)
+    root = get_template(order).copy()
+    try:
+        root.select_rows(sudoku.get_clue_rows(zero_rows))
+    except dlx.ConflictError:
+        return 0, None
+    tasks = [(zero_rows, prefix, max_solutions) for prefix in root.split(depth)]
+    count = 0
+    solution = None
+    with multiprocessing.Pool(processes or multiprocessing.cpu_count()) as pool:
+        for n_found, first in pool.imap_unordered(_solve_subtree, tasks):
+            count += n_found
+            if solution is None:
+                solution = first
+            if max_solutions and count >= max_solutions:
+                pool.terminate()
+                return max_solutions, solution
+    return count, solution
+
+def get_indices(order: int) -> Dict[str, int]:
+    'the value of each symbol that puzzles of the order are written with'
     if order == 4:
         return _order4_indices
     elif order == 5:
@@ -356,32 +849,312 @@ above are given here
     assert order*order == len(dot_rows)
     for row in dot_rows:
         assert len(row) == order*order
-    indices = _get_indices(order)
+    indices = get_indices(order)
     return [[indices[x] for x in dot_row] for dot_row in dot_rows]
 
-def solve_dot_rows(dot_rows: List[str]) -> None:
-    'Solve Sudoku puzzle represented as a dot-based string'
+def solve_dot_rows(dot_rows: List[str], # pylint: disable=too-many-arguments
+                   processes: int = 1,
+                   draw: bool = True,
+                   stats: bool = False,
+                   engine: str = 'array',
+                   cache: Any = None,
+                   deduce: bool = False) -> None:
+    '''
+    Solve Sudoku puzzle represented as a dot-based string; the options
+    are passed on to solve_zero_rows
+    '''
     zero_rows = _dot_rows_to_zero_rows(dot_rows=dot_rows)
-    solve_zero_rows(zero_rows)
+    solve_zero_rows(zero_rows=zero_rows, processes=processes, draw=draw,
+                    stats=stats, engine=engine, cache=cache, deduce=deduce)
+
+def _load_zero_rows(entry: Dict) -> Puzzle:
+    'the zero row representation of a puzzle entry of a YAML file'
+    if 'dot_rows' in entry:
+        return _dot_rows_to_zero_rows(entry['dot_rows'])
+    return entry['zero_rows']
 
-def work(path: str, puzzle: int) -> None:
-    'Loads puzzles from a YAML file and solve the puzzle of your choice'
+def line_to_zero_rows(line: str) -> Puzzle:
+    '''
+    the inverse of zero_rows_to_line: the order^4 symbols of a puzzle on
+    one line, row after row. Besides '.', blank cells may be written as
+    '0' for orders 2 and 3, whose symbols do not include it.
+    '''
+    import math
+    n2 = int(round(math.sqrt(len(line))))
+    order = int(round(math.sqrt(n2)))
+    if order * order != n2 or n2 * n2 != len(line):
+        raise ValueError('a line of %d symbols is not a Sudoku puzzle' % len(line))
+    indices = get_indices(order)
+    if order <= 3:
+        indices = dict(indices, **{'0': 0})
+    values = [indices[symbol] for symbol in line]
+    return [values[i:i + n2] for i in range(0, n2 * n2, n2)]
+
+def _iter_yaml_entries(fobj) -> Iterator[Dict]:
+    '''
+    Yields the entries of a YAML file holding a sequence of them, like
+    input.yaml, one at a time: the parser reads the file in blocks and
+    each entry is composed and constructed on its own, so the file is
+    never held in memory as a whole
+    '''
     import yaml
+    loader = yaml.SafeLoader(fobj)
+    try:
+        loader.get_event()      # stream start
+        loader.get_event()      # document start
+        if not isinstance(loader.get_event(), yaml.SequenceStartEvent):
+            raise ValueError('%s does not hold a sequence of puzzles'
+                             % getattr(fobj, 'name', 'the YAML input'))
+        while not loader.check_event(yaml.SequenceEndEvent):
+            node = loader.compose_node(None, None)
+            loader.anchors = {}
+            yield loader.construct_document(node)
+    finally:
+        loader.dispose()
+
+def iter_puzzles(path: str,
+                 start: int = 0,
+                 stop: Optional[int] = None) -> Iterator[Puzzle]:
+    '''
+    Yields the puzzles start .. stop - 1 of a file (to the end when stop
+    is None) one at a time, in the zero row representation, reading no
+    more of the file than it has to. Memory use does not grow with the
+    size of the file.
+
+    A file in the binary format of packed.py is recognized by its magic
+    number and jumps straight to puzzle start. A .yaml or .yml file
+    holds a sequence of entries with 'dot_rows' or 'zero_rows', like
+    input.yaml. Any other file has one puzzle per line, all its symbols
+    on the line row after row, e.g. 81 characters for the usual 9 x 9
+    puzzle (see line_to_zero_rows); blank lines and lines starting with
+    '#' are skipped.
+    '''
+    import itertools
+    import packed
+    if packed.is_packed(path):
+        with packed.Reader(path) as reader:
+            yield from reader.iter(start, stop)
+        return
+    yield from itertools.islice(_iter_text_puzzles(path), start, stop)
+
+def _iter_text_puzzles(path: str) -> Iterator[Puzzle]:
+    # all the puzzles of a YAML or one-per-line file, see iter_puzzles
     with open(path, 'r') as fobj:
-        ans = yaml.safe_load(fobj)
+        if path.endswith(('.yaml', '.yml')):
+            for entry in _iter_yaml_entries(fobj):
+                yield _load_zero_rows(entry)
+            return
+        for line in fobj:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line_to_zero_rows(line)
+
+def zero_rows_to_dot_rows(zero_rows: Puzzle) -> List[str]:
+    'the inverse of _dot_rows_to_zero_rows'
+    import math
+    order = int(math.sqrt(len(zero_rows)))
+    labels = {v : c for c, v in get_indices(order).items()}
+    return [''.join(labels[value] for value in row) for row in zero_rows]
+
+def zero_rows_to_line(zero_rows: Puzzle) -> str:
+    'the puzzle as a single line of symbols with \'.\' for blank cells'
+    return ''.join(zero_rows_to_dot_rows(zero_rows))
+
+def work(path: str, # pylint: disable=too-many-arguments
+         puzzle: int,
+         processes: int = 1,
+         draw: bool = True,
+         stats: bool = False,
+         engine: str = 'array',
+         cache: Any = None,
+         deduce: bool = False) -> None:
+    '''
+    Loads puzzles from a file (see iter_puzzles) and solve the puzzle of
+    your choice; the file is only read as far as that puzzle. cache and
+    deduce are passed on to solve_zero_rows.
+    '''
+    zero_rows = next(iter_puzzles(path, puzzle, puzzle + 1), None)
+    if zero_rows is None:
+        raise IndexError('%s has no puzzle %d' % (path, puzzle))
+    solve_zero_rows(zero_rows=zero_rows, processes=processes, draw=draw,
+                    stats=stats, engine=engine, cache=cache, deduce=deduce)
+
+def work_many(path: str, # pylint: disable=too-many-arguments
+              start: int,
+              stop: Optional[int],
+              output: str,
+              processes: int = 1,
+              stats: bool = False,
+              engine: str = 'array',
+              store: Any = None,
+              deduce: bool = False) -> None:
+    '''
+    Reads puzzles from a file (see iter_puzzles) and solves puzzles
+    start .. stop - 1 (all the remaining ones when stop is None) on the
+    given number of processes, see solve_many. The puzzles are streamed:
+    they are read while the workers solve the ones before them, and
+    memory use does not grow with the size of the file. Each solution is
+    written to output as soon as it is available, one line of symbols per
+    puzzle, or as a record of the binary format of packed.py if output
+    ends in packed.SUFFIX; a puzzle with no solution is written as given,
+    with its blank cells. The throughput is reported on stderr, and with
+    stats=True so is a line of search counters per puzzle. engine and
+    deduce are passed on to solve_many.
+
+    With a store.SolutionStore the puzzles are looked up in it, many at
+    a time, before any of them is searched: only those it has no answer
+    for go to the workers, and their answers are added to it.
+
+    A packed file holds puzzles of one order, so puzzles of several
+    orders with a packed output raise a click.UsageError before any of
+    them is solved.
+    '''
+    import itertools
+    import time
+    import packed
+    if output.endswith(packed.SUFFIX) and not packed.is_packed(path):
+        orders = sorted({packed.order_of(zero_rows)
+                         for zero_rows in iter_puzzles(path, start, stop)})
+        if len(orders) > 1:
+            raise click.UsageError(
+                'the puzzles are of orders %s, but a %s file holds one order; write '
+                'lines instead or pick the puzzles of one order with packed.py pack --order'
+                % (', '.join(map(str, orders)), packed.SUFFIX))
+    # one copy of the puzzles for the solver and one to write out those
+    # without a solution; tee only keeps the puzzles in between. Each
+    # puzzle comes with its entry in the store, None if it has to be
+    # solved
+    if store is not None:
+        given, pending = itertools.tee(store.lookup(iter_puzzles(path, start, stop)))
+        puzzles = (zero_rows for zero_rows, entry in pending if entry is None)
+    else:
+        puzzles, unsolved = itertools.tee(iter_puzzles(path, start, stop))
+        given = ((zero_rows, None) for zero_rows in unsolved)
+    n_puzzles = n_solved = 0
+    start_time = time.time()
+
+    def get_solutions() -> Iterator[Puzzle]:
+        'the solutions to write, or the puzzles that have none'
+        nonlocal n_puzzles, n_solved
+        if stats or store is not None:
+            results = solve_many_stats(puzzles, processes=processes, engine=engine,
+                                       deduce=deduce)
+        else:
+            results = ((solution, None) for solution
+                       in solve_many(puzzles, processes=processes, engine=engine,
+                                     deduce=deduce))
+        for zero_rows, entry in given:
+            if entry is not None:
+                solution = entry.solutions[0] if entry.solutions else None
+                if stats:
+                    click.echo('puzzle %d: from the store' % (start + n_puzzles), err=True)
+            else:
+                solution, search_stats = next(results)
+                if stats:
+                    click.echo('puzzle %d: %s' % (start + n_puzzles, search_stats.summary()),
+                               err=True)
+                if store is not None:
+                    store.add(zero_rows, [solution] if solution else [], 1, search_stats)
+            n_puzzles += 1
+            if solution is None:
+                yield zero_rows
+            else:
+                n_solved += 1
+                yield solution
+
     try:
-        dot_rows = ans[puzzle]['dot_rows']
-        solve_dot_rows(dot_rows=dot_rows)
-    except KeyError:
-        zero_rows = ans[puzzle]['zero_rows']
-        solve_zero_rows(zero_rows=zero_rows)
+        if output.endswith(packed.SUFFIX):
+            packed.write(output, get_solutions())
+        else:
+            with click.open_file(output, 'w') as fobj:
+                for solution in get_solutions():
+                    fobj.write(zero_rows_to_line(solution) + '\n')
+    finally:
+        if store is not None:
+            store.flush()
+    elapsed = time.time() - start_time
+    click.echo('solved %d of %d puzzles in %.3f s (%.1f puzzles/sec)'
+               % (n_solved, n_puzzles, elapsed,
+                  n_puzzles / elapsed if elapsed > 0 else 0.0),
+               err=True)
+    if store is not None:
+        click.echo('%d answered by the store, %d searched' % (store.hits, store.misses),
+                   err=True)
+
+def parse_range(value: str) -> Tuple[int, Optional[int]]:
+    'parses START:STOP, where either bound may be left out'
+    start, _, stop = value.partition(':')
+    return int(start or 0), int(stop) if stop else None
 
 @click.command()
-@click.option("--path", type=str, help='path to input yaml file', prompt=True)
-@click.option("--puzzle", type=int, help='zero based puzzle number', prompt=True)
-def main(path: str, puzzle: int) -> None:
+@click.option("--path", type=str, prompt=True,
+              help='path to input yaml file, a file with one puzzle per line '
+                   'or a packed file')
+@click.option("--puzzle", type=int, help='zero based puzzle number')
+@click.option("--all", "solve_all", is_flag=True,
+              help='solve every puzzle in the file without drawing')
+@click.option("--range", "puzzle_range", type=str,
+              help='solve puzzles START:STOP (zero based, STOP excluded) '
+                   'without drawing')
+@click.option("--output", type=str, default='-',
+              help='where --all/--range write the solutions (default stdout), '
+                   'packed if it ends in .sdkp')
+@click.option("--processes", "-j", type=int, default=1,
+              help='worker processes for --all/--range (0: one per CPU)')
+@click.option("--parallel", is_flag=True,
+              help='split the search of a single --puzzle over the '
+                   '--processes workers')
+@click.option("--draw/--no-draw", default=True,
+              help='draw the solution of a single --puzzle in a window, '
+                   'or print it (headless)')
+@click.option("--stats", is_flag=True,
+              help='report the search counters (nodes per depth, branching, '
+                   'backtracks, ...) on stderr; not with --parallel')
+@click.option("--engine", type=click.Choice(sorted(ENGINES)), default='array',
+              show_default=True,
+              help='exact cover engine: linked arrays or bitsets; '
+                   'not with --parallel')
+@click.option("--cache", "cache_path", type=str,
+              help='file of solutions to look a single --puzzle up in, and '
+                   'to add it to; equivalent puzzles share an entry')
+@click.option("--store", "store_path", type=str,
+              help='SQLite file of solved puzzles to look puzzles up in before '
+                   'searching, and to add the new ones to')
+@click.option("--deduce", is_flag=True,
+              help='fill the cells that singles, locked candidates and pairs '
+                   'force before searching')
+def main(path: str, puzzle: Optional[int], solve_all: bool, # pylint: disable=too-many-arguments,too-many-locals
+         puzzle_range: Optional[str], output: str, processes: int,
+         parallel: bool, draw: bool, stats: bool, engine: str,
+         cache_path: Optional[str], store_path: Optional[str], deduce: bool) -> None:
     'main entry point'
-    work(path, puzzle)
+    if cache_path is not None and store_path is not None:
+        raise click.UsageError('use either --cache or --store')
+    solution_store = None
+    if store_path is not None:
+        import store
+        solution_store = store.SolutionStore(store_path)
+    try:
+        if solve_all or puzzle_range is not None:
+            start, stop = parse_range(puzzle_range or ':')
+            work_many(path, start, stop, output, processes, stats, engine,
+                      solution_store, deduce)
+            return
+        if puzzle is None:
+            puzzle = click.prompt('Puzzle', type=int)
+        cache = solution_store
+        if cache_path is not None:
+            import canon
+            cache = canon.SolutionCache(path=cache_path)
+        try:
+            work(path, puzzle, processes if parallel else 1, draw, stats, engine, cache,
+                 deduce)
+        finally:
+            if cache_path is not None:
+                cache.save()
+    finally:
+        if solution_store is not None:
+            solution_store.close()
 
 if __name__ == '__main__':
     # pylint: disable=no-value-for-parameter
@@ -0,0 +1,32 @@
+'''
+conftest.py
+
+Puts the modules at the top of the repository on the import path and
+holds the fixtures that the tests share.
+'''
+
+import os
+import sys
+from typing import List
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sudoku                               # pylint: disable=wrong-import-position
+
+@pytest.fixture(scope='session')
+def repo_dir() -> str:
+    'the top directory of the repository, with the puzzle files'
+    return ROOT
+
+@pytest.fixture(scope='session')
+def input_path() -> str:
+    'the path of input.yaml'
+    return os.path.join(ROOT, 'input.yaml')
+
+@pytest.fixture(scope='session')
+def small_puzzles(input_path: str) -> List[sudoku.Puzzle]: # pylint: disable=redefined-outer-name
+    'the puzzles of input.yaml of order 4 and less, whose searches take milliseconds'
+    return [zero_rows for zero_rows in sudoku.iter_puzzles(input_path)
+            if len(zero_rows) <= 16]
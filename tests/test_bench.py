@@ -0,0 +1,28 @@
+'''
+test_bench.py
+
+Timeouts in the benchmark count against an engine, in its throughput
+and in the comparison with a baseline.
+'''
+
+import os
+import bench
+
+def test_timeouts_count_against_the_rate(repo_dir: str) -> None:
+    puzzles = bench.load_corpus(os.path.join(repo_dir, 'puzzles.yaml'))
+    timeout = 0.05
+    result = bench.run('puzzles.yaml', puzzles, 'backtrack', timeout, memory=False)
+    assert result['timeouts'] > 0
+    assert result['puzzles'] + result['timeouts'] == len(puzzles)
+    elapsed = result['setup_seconds'] + result['search_seconds']
+    assert result['puzzles_per_second'] <= len(puzzles) / (elapsed + timeout)
+
+def test_compare_fails_on_more_timeouts() -> None:
+    baseline = [{'corpus': 'c', 'engine': 'e', 'timeouts': 1, 'puzzles_per_second': 10.0}]
+    same = [dict(baseline[0], puzzles_per_second=9.0)]
+    slower = [dict(baseline[0], puzzles_per_second=7.0)]
+    # fewer puzzles solved in time can look faster
+    more_timeouts = [dict(baseline[0], timeouts=2, puzzles_per_second=12.0)]
+    assert not bench.compare(same, baseline, 0.2)
+    assert len(bench.compare(slower, baseline, 0.2)) == 1
+    assert len(bench.compare(more_timeouts, baseline, 0.2)) == 1
@@ -0,0 +1,78 @@
+'''
+test_canon.py
+
+Canonical forms under random transforms of the puzzles in input.yaml,
+and the solutions that the cache answers them with.
+'''
+
+import math
+import random
+from typing import List
+import canon
+import sudoku
+
+Puzzle = List[List[int]]                    # pylint: disable=invalid-name
+
+def _random_lines(order: int, rng: random.Random) -> List[int]:
+    # the bands in a random order and the lines of each band too
+    bands = list(range(order))
+    rng.shuffle(bands)
+    lines = []
+    for band in bands:
+        within = list(range(band * order, (band + 1) * order))
+        rng.shuffle(within)
+        lines.extend(within)
+    return lines
+
+def _random_transform(order: int, rng: random.Random) -> canon.Transform:
+    labels = list(range(1, order * order + 1))
+    rng.shuffle(labels)
+    return canon.Transform(rng.random() < 0.5, _random_lines(order, rng),
+                           _random_lines(order, rng), [0] + labels)
+
+def _is_solution(solution: Puzzle, zero_rows: Puzzle) -> bool:
+    # a complete grid that keeps the values of the puzzle
+    n2 = len(zero_rows)
+    order = int(math.sqrt(n2))
+    values = set(range(1, n2 + 1))
+    boxes = [[solution[br * order + r][bc * order + c]
+              for r in range(order) for c in range(order)]
+             for br in range(order) for bc in range(order)]
+    units = solution + [list(col) for col in zip(*solution)] + boxes
+    return (all(set(unit) == values for unit in units)
+            and all(not z or z == s for z_row, s_row in zip(zero_rows, solution)
+                    for z, s in zip(z_row, s_row)))
+
+def test_canonical_form_is_invariant(small_puzzles: List[Puzzle]) -> None:
+    forms = 0
+    for index, zero_rows in enumerate(small_puzzles):
+        form = canon.canonical_form(zero_rows)
+        if form is None:
+            continue
+        forms += 1
+        puzzle, transform = form
+        assert transform.apply(zero_rows) == puzzle
+        assert transform.invert(puzzle) == zero_rows
+        rng = random.Random(index)
+        order = int(math.sqrt(len(zero_rows)))
+        for _ in range(5):
+            shuffled = _random_transform(order, rng).apply(zero_rows)
+            assert canon.canonical_form(shuffled)[0] == puzzle
+    assert forms
+
+def test_cache_hits_solve_the_puzzle_asked(small_puzzles: List[Puzzle]) -> None:
+    for index, zero_rows in enumerate(small_puzzles):
+        cache = canon.SolutionCache()
+        expected = sudoku.solve(zero_rows, max_solutions=2)
+        assert cache.solve(zero_rows, max_solutions=2) == expected
+        rng = random.Random(index)
+        order = int(math.sqrt(len(zero_rows)))
+        for _ in range(5):
+            shuffled = _random_transform(order, rng).apply(zero_rows)
+            hits = cache.hits
+            solutions = cache.solve(shuffled, max_solutions=2)
+            if canon.canonical_form(zero_rows) is not None:
+                assert cache.hits == hits + 1
+            assert len(solutions) == len(expected)
+            assert all(_is_solution(solution, shuffled) for solution in solutions)
+            assert len({sudoku.zero_rows_to_line(s) for s in solutions}) == len(solutions)
@@ -0,0 +1,111 @@
+'''
+test_dlx.py
+
+The exact cover engines and searches of dlx.py on the puzzles of
+input.yaml.
+'''
+
+from typing import List
+import pytest
+import dlx
+import sudoku
+
+# enough to tell the puzzles with a few solutions apart without
+# counting every solution of the ones with many
+MAX_SOLUTIONS = 10
+
+def _links_root(zero_rows: sudoku.Puzzle) -> dlx.Root:
+    puzzle = sudoku.Sudoku(int(len(zero_rows) ** 0.5), zero_rows)
+    root = dlx.Root(list(range(puzzle.n_dlx_columns)), puzzle.get_set_bits())
+    root.select_rows(puzzle.get_clue_rows(zero_rows))
+    return root
+
+def _pruned_root(zero_rows: sudoku.Puzzle, engine: str) -> dlx.ArrayRoot:
+    puzzle = sudoku.Sudoku(int(len(zero_rows) ** 0.5), zero_rows)
+    return puzzle.get_pruned_root(zero_rows, engine=engine)
+
+def test_engines_count_the_same_solutions(small_puzzles: List[sudoku.Puzzle]) -> None:
+    for zero_rows in small_puzzles:
+        count = _links_root(zero_rows).search(None, max_solutions=MAX_SOLUTIONS)
+        for engine in sorted(sudoku.ENGINES):
+            root = _pruned_root(zero_rows, engine)
+            assert root.search(None, max_solutions=MAX_SOLUTIONS,
+                               heuristic=sudoku.HEURISTIC) == count
+        assert len(sudoku.solve(zero_rows, max_solutions=MAX_SOLUTIONS)) == count
+
+def test_iterative_search_matches_recursive(small_puzzles: List[sudoku.Puzzle]) -> None:
+    for zero_rows in small_puzzles:
+        runs = []
+        for iterative in (False, True):
+            solutions = [] # type: List[List[List[int]]]
+            stats = dlx.SearchStats()
+            root = _links_root(zero_rows)
+            count = root.search(lambda rows, found=solutions: found.append(list(rows)),
+                                iterative=iterative, stats=stats,
+                                max_solutions=MAX_SOLUTIONS)
+            runs.append((count, solutions, stats.nodes, stats.backtracks))
+            # the matrix is restored, so a second search finds the same
+            assert root.search(None, iterative=iterative,
+                               max_solutions=MAX_SOLUTIONS) == count
+        assert runs[0] == runs[1]
+
+def test_search_stats_add_up(small_puzzles: List[sudoku.Puzzle]) -> None:
+    for zero_rows in small_puzzles:
+        if len(sudoku.solve(zero_rows, max_solutions=2)) != 1:
+            continue
+        for engine in sorted(sudoku.ENGINES):
+            stats = dlx.SearchStats()
+            # the whole tree, so that every row taken is taken back
+            count = _pruned_root(zero_rows, engine).search(None, stats=stats,
+                                                           heuristic=sudoku.HEURISTIC)
+            assert count == stats.solutions == 1
+            assert stats.nodes[0] == 1
+            assert sum(stats.nodes) == sum(stats.branching.values()) + stats.solutions
+            assert stats.dead_ends == stats.branching.get(0, 0)
+            assert stats.covers == stats.uncovers
+            # every row tried was taken back, and only those on the path
+            # to the solution, one per level, had a solution below them
+            rows_tried = sum(size * n for size, n in stats.branching.items())
+            assert stats.backtracks == rows_tried - (len(stats.nodes) - 1)
+            assert stats.first_solution is not None
+            assert 0 <= stats.first_solution <= stats.elapsed
+
+def test_split_covers_the_whole_tree(small_puzzles: List[sudoku.Puzzle]) -> None:
+    for zero_rows in small_puzzles:
+        order = int(len(zero_rows) ** 0.5)
+        puzzle = sudoku.Sudoku(order, zero_rows)
+        root = sudoku.get_template(order).copy()
+        root.select_rows(puzzle.get_clue_rows(zero_rows))
+        count = root.search(None, max_solutions=1000)
+        if count == 1000:
+            # too many solutions to count them all here
+            continue
+        for depth in (1, 2, 3):
+            counts = []
+            for prefix in root.split(depth):
+                branch = root.copy()
+                branch.select_rows(prefix)
+                counts.append(branch.search(None))
+            assert sum(counts) == count
+
+def test_heuristics_count_the_same_solutions(small_puzzles: List[sudoku.Puzzle]) -> None:
+    for zero_rows in small_puzzles:
+        # a search leaves its matrix as it found it, so one of each will do
+        links = _links_root(zero_rows)
+        pruned = [_pruned_root(zero_rows, engine) for engine in sorted(sudoku.ENGINES)]
+        count = links.search(None, max_solutions=MAX_SOLUTIONS)
+        # the seed only matters to 'random'
+        runs = [(heuristic, None) for heuristic in dlx.HEURISTICS] + [('random', 1)]
+        for heuristic, seed in runs:
+            roots = pruned if heuristic == 'buckets' else [links] + pruned
+            for root in roots:
+                assert root.search(None, max_solutions=MAX_SOLUTIONS, heuristic=heuristic,
+                                   seed=seed) == count
+
+def test_unknown_heuristics_are_refused(small_puzzles: List[sudoku.Puzzle]) -> None:
+    zero_rows = small_puzzles[0]
+    with pytest.raises(ValueError):
+        _links_root(zero_rows).search(None, heuristic='buckets')
+    for engine in sorted(sudoku.ENGINES):
+        with pytest.raises(ValueError):
+            _pruned_root(zero_rows, engine).search(None, heuristic='max')
@@ -0,0 +1,60 @@
+'''
+test_generate.py
+
+Generated puzzles have a unique solution, are minimal and keep the
+symmetry of their clues.
+'''
+
+import time
+import generate
+import sudoku
+
+def _clues(puzzle: sudoku.Puzzle) -> set:
+    return {(row, col) for row, values in enumerate(puzzle)
+            for col, value in enumerate(values) if value}
+
+def test_orbits_partition_the_grid() -> None:
+    for n2 in (4, 9, 16):
+        for symmetry, cells in generate.SYMMETRIES.items():
+            orbits = generate._get_orbits(n2, symmetry) # pylint: disable=protected-access
+            flat = [cell for orbit in orbits for cell in orbit]
+            assert sorted(flat) == [(row, col) for row in range(n2) for col in range(n2)]
+            # every cell of an orbit leads back to the same orbit
+            for orbit in orbits:
+                for row, col in orbit:
+                    assert sorted(set(cells(n2, row, col))) == orbit
+    # the symmetries of the square have up to 8 images of a cell
+    assert max(len(orbit) for orbit in generate._get_orbits(9, 'dihedral')) == 8
+    assert max(len(orbit) for orbit in generate._get_orbits(9, 'rotational90')) == 4
+
+def test_puzzles_are_unique_minimal_and_symmetric() -> None:
+    for order, seeds in ((2, range(10)), (3, range(4))):
+        for symmetry, cells in generate.SYMMETRIES.items():
+            for seed in seeds:
+                puzzle = generate.generate(order, symmetry, seed)
+                solutions = sudoku.solve(puzzle, max_solutions=2)
+                assert len(solutions) == 1
+                clues = _clues(puzzle)
+                n2 = order * order
+                assert all(set(cells(n2, row, col)) <= clues for row, col in clues)
+                # no orbit of clues can go without losing the uniqueness
+                for row, col in clues:
+                    fewer = [list(values) for values in puzzle]
+                    for other_row, other_col in cells(n2, row, col):
+                        fewer[other_row][other_col] = 0
+                    assert len(sudoku.solve(fewer, max_solutions=2)) == 2
+
+def test_node_budget_keeps_the_solution_unique() -> None:
+    for seed in range(3):
+        puzzle = generate.generate(3, seed=seed, max_nodes=1)
+        assert len(sudoku.solve(puzzle, max_solutions=2)) == 1
+        # nearly every check runs out of so small a budget
+        assert len(_clues(puzzle)) > len(_clues(generate.generate(3, seed=seed)))
+
+def test_generate_many() -> None:
+    serial = list(generate.generate_many(2, 6, seed=1))
+    pooled = list(generate.generate_many(2, 6, seed=1, processes=2))
+    assert sorted(serial) == sorted(pooled)
+    start = time.time()
+    assert len(list(generate.generate_many(5, 3, processes=1, seconds=0.5))) < 3
+    assert time.time() - start < 3.0
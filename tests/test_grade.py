@@ -0,0 +1,42 @@
+'''
+test_grade.py
+
+The grades of the puzzles of puzzles.yaml and input.yaml.
+'''
+
+import os
+from typing import List
+import yaml
+import grade
+import sudoku
+
+def test_levels_given_by_hand(repo_dir: str) -> None:
+    path = os.path.join(repo_dir, 'puzzles.yaml')
+    with open(path) as fobj:
+        entries = yaml.safe_load(fobj)
+    levels = [entry.get('level') for entry in entries]
+    assert any(levels)
+    for level, zero_rows in zip(levels, sudoku.iter_puzzles(path)):
+        puzzle_grade = grade.grade(zero_rows)
+        assert puzzle_grade.solutions == 1
+        assert puzzle_grade.nodes > 0
+        if level is not None:
+            assert puzzle_grade.level == level
+
+def test_puzzles_without_one_solution(small_puzzles: List[sudoku.Puzzle]) -> None:
+    counts = set()
+    for zero_rows in small_puzzles:
+        puzzle_grade = grade.grade(zero_rows)
+        assert puzzle_grade.level in grade.LEVELS
+        count = len(sudoku.solve(zero_rows, max_solutions=2))
+        counts.add(count)
+        assert puzzle_grade.solutions == count
+        if count == 0:
+            assert puzzle_grade.level == 'invalid'
+        elif count > 1:
+            assert puzzle_grade.level == 'multiple'
+        else:
+            assert puzzle_grade.level not in ('invalid', 'multiple')
+    assert counts == {0, 1, 2}
+    clash = [[1, 1, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+    assert grade.grade(clash).level == 'invalid'
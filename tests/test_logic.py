@@ -0,0 +1,57 @@
+'''
+test_logic.py
+
+Deduction on the puzzles of input.yaml: it only fills cells that every
+solution agrees on, and finds the puzzles that break the rules.
+'''
+
+import copy
+from typing import List
+import pytest
+import logic
+import sudoku
+
+def test_deduce_keeps_the_solutions(small_puzzles: List[sudoku.Puzzle]) -> None:
+    for zero_rows in small_puzzles:
+        given = copy.deepcopy(zero_rows)
+        solutions = sudoku.solve(zero_rows, max_solutions=11)
+        try:
+            residual, counts = logic.deduce(zero_rows)
+        except logic.Contradiction:
+            assert not solutions
+            continue
+        assert zero_rows == given
+        assert set(counts) == set(logic.TECHNIQUES)
+        for row, residual_row in zip(zero_rows, residual):
+            assert all(not z or z == r for z, r in zip(row, residual_row))
+        for solution in solutions:
+            assert all(not r or r == s for residual_row, row in zip(residual, solution)
+                       for r, s in zip(residual_row, row))
+        residual_solutions = sudoku.solve(residual, max_solutions=11)
+        if len(solutions) < 11:
+            assert sorted(residual_solutions) == sorted(solutions)
+        else:
+            # more than are counted here, so not necessarily the same ones
+            assert len(residual_solutions) == 11
+        if logic.is_complete(residual):
+            assert solutions == [residual]
+
+def test_deduce_solves_the_easy_puzzles(input_path: str) -> None:
+    # the 9 x 9 puzzles with a unique solution mostly need no search
+    puzzles = [zero_rows for zero_rows in sudoku.iter_puzzles(input_path)
+               if len(zero_rows) == 9]
+    unique = [zero_rows for zero_rows in puzzles
+              if len(sudoku.solve(zero_rows, max_solutions=2)) == 1]
+    complete = [zero_rows for zero_rows in unique
+                if logic.is_complete(logic.deduce(zero_rows)[0])]
+    assert len(complete) > len(unique) // 2
+
+def test_broken_puzzles_are_contradictions() -> None:
+    clash = [[1, 0, 0, 1], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+    with pytest.raises(logic.Contradiction):
+        logic.deduce(clash)
+    # no value is left for the last cell of the first row
+    no_place = [[1, 2, 3, 0], [0, 0, 0, 4], [0, 0, 0, 0], [0, 0, 0, 0]]
+    with pytest.raises(logic.Contradiction):
+        logic.deduce(no_place)
+    assert not sudoku.solve(clash) and not sudoku.solve(no_place)
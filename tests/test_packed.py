@@ -0,0 +1,75 @@
+'''
+test_packed.py
+
+The packed binary format: records, files and the memory-mapped Reader.
+'''
+
+import os
+import random
+from typing import List
+import click
+import pytest
+import packed
+import sudoku
+
+def _random_puzzle(order: int, rng: random.Random) -> sudoku.Puzzle:
+    n2 = order * order
+    return [[rng.choice((0, rng.randint(1, n2))) for _ in range(n2)] for _ in range(n2)]
+
+def test_records_round_trip() -> None:
+    rng = random.Random(0)
+    for order in (2, 3, 4, 5, 6):
+        for _ in range(20):
+            zero_rows = _random_puzzle(order, rng)
+            record = packed.encode(zero_rows)
+            assert len(record) == packed.record_size(order)
+            assert packed.decode(record, order) == zero_rows
+    assert packed.record_size(3) == 41
+
+def test_reader(small_puzzles: List[sudoku.Puzzle], tmp_path) -> None:
+    path = os.path.join(str(tmp_path), 'puzzles' + packed.SUFFIX)
+    puzzles = [zero_rows for zero_rows in small_puzzles if len(zero_rows) == 9]
+    assert packed.write(path, iter(puzzles)) == len(puzzles)
+    assert packed.is_packed(path)
+    with packed.Reader(path) as reader:
+        assert (len(reader), reader.order) == (len(puzzles), 3)
+        assert list(reader) == puzzles
+        assert list(reader.iter(3, 7)) == puzzles[3:7]
+        assert list(reader.iter(len(puzzles) - 2, 1000)) == puzzles[-2:]
+        assert reader[0] == puzzles[0] and reader[-1] == puzzles[-1]
+        assert bytes(reader.record(5)) == packed.encode(puzzles[5])
+        with pytest.raises(IndexError):
+            reader.record(len(puzzles))
+    # the puzzles of a packed file are read through the Reader
+    assert list(sudoku.iter_puzzles(path, 2, 4)) == puzzles[2:4]
+
+def test_bad_files(small_puzzles: List[sudoku.Puzzle], tmp_path) -> None:
+    path = os.path.join(str(tmp_path), 'puzzles' + packed.SUFFIX)
+    puzzles = [zero_rows for zero_rows in small_puzzles if len(zero_rows) == 9]
+    packed.write(path, puzzles)
+    with open(path, 'rb') as fobj:
+        data = fobj.read()
+    with open(path, 'wb') as fobj:
+        fobj.write(data[:-1])
+    with pytest.raises(ValueError):
+        packed.Reader(path)
+    with open(path, 'wb') as fobj:
+        fobj.write(b'XXXX' + data[4:])
+    with pytest.raises(ValueError):
+        packed.Reader(path)
+
+def test_mixed_orders(small_puzzles: List[sudoku.Puzzle], input_path: str,
+                      tmp_path) -> None:
+    path = os.path.join(str(tmp_path), 'mixed' + packed.SUFFIX)
+    puzzles = sorted(small_puzzles, key=len)
+    n_small = sum(len(zero_rows) == 9 for zero_rows in puzzles)
+    with pytest.raises(ValueError):
+        packed.write(path, puzzles)
+    # what was written before the error is a valid file
+    with packed.Reader(path) as reader:
+        assert list(reader) == puzzles[:n_small]
+    # and a batch run refuses the mix before solving anything
+    os.remove(path)
+    with pytest.raises(click.UsageError):
+        sudoku.work_many(input_path, 0, None, path)
+    assert not os.path.exists(path)
@@ -0,0 +1,49 @@
+'''
+test_server.py
+
+The solve server, called the way a plain HTTP client calls it.
+'''
+
+import asyncio
+import json
+from typing import Tuple
+import server
+
+PUZZLE = {'dot_rows': ['1.4.', '...3', '2...', '.1.4']}
+
+async def _request(port: int, request: bytes) -> Tuple[int, dict]:
+    # sends the request and reads the answer up to the end of the
+    # connection, not just up to its Content-Length
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(request)
+    await writer.drain()
+    answer = await asyncio.wait_for(reader.read(), 5.0)
+    writer.close()
+    head, _, body = answer.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+def _post(body: dict) -> bytes:
+    payload = json.dumps(body).encode()
+    return (b'POST /solve HTTP/1.1\r\nHost: localhost\r\n'
+            b'Content-Length: %d\r\n\r\n' % len(payload)) + payload
+
+def test_connections_end_after_the_answer() -> None:
+    async def run() -> None:
+        service = server.SolveServer(processes=2, timeout=5.0)
+        await service.start(port=0)
+        try:
+            # the first requests are the ones the workers would be
+            # started for, and would hold on to, if they started late
+            for _ in range(3):
+                status, answer = await _request(service.port, _post(PUZZLE))
+                assert status == 200
+                assert answer['status'] == 'solved'
+                assert answer['solutions'] == [['1342', '4213', '2431', '3124']]
+            status, answer = await _request(
+                service.port, b'GET /health HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            assert status == 200 and answer['requests'] == 3
+            status, answer = await _request(service.port, _post({'dot_rows': ['1']}))
+            assert status == 400 and 'error' in answer
+        finally:
+            await service.close()
+    asyncio.run(run())
@@ -0,0 +1,62 @@
+'''
+test_store.py
+
+The SQLite solution store: what it answers, and that it keeps it
+across reopening.
+'''
+
+import os
+from typing import List
+import store
+import sudoku
+
+def test_covers() -> None:
+    # pylint: disable=protected-access
+    grid = [[1]]
+    # every solution was searched for
+    assert store._covers(store.Entry([grid] * 3, 0, None, None), 0)
+    assert store._covers(store.Entry([grid] * 3, 0, None, None), 5)
+    # fewer found than looked for: there are no others
+    assert store._covers(store.Entry([grid], 2, None, None), 0)
+    assert store._covers(store.Entry([grid], 2, None, None), 10)
+    # as many found as looked for: only as good as that search
+    assert store._covers(store.Entry([grid] * 2, 2, None, None), 1)
+    assert store._covers(store.Entry([grid] * 2, 2, None, None), 2)
+    assert not store._covers(store.Entry([grid] * 2, 2, None, None), 3)
+    assert not store._covers(store.Entry([grid] * 2, 2, None, None), 0)
+
+def test_solve_stores_and_answers(small_puzzles: List[sudoku.Puzzle], tmp_path) -> None:
+    path = os.path.join(str(tmp_path), 'solutions.db')
+    expected = [sudoku.solve(zero_rows, max_solutions=2) for zero_rows in small_puzzles]
+    with store.SolutionStore(path) as solutions:
+        assert [solutions.solve(zero_rows, max_solutions=2)
+                for zero_rows in small_puzzles] == expected
+        assert (solutions.hits, solutions.misses) == (0, len(small_puzzles))
+    with store.SolutionStore(path) as solutions:
+        assert len(solutions) == len(small_puzzles)
+        assert [solutions.solve(zero_rows, max_solutions=2, deduce=True)
+                for zero_rows in small_puzzles] == expected
+        assert [solutions.solve(zero_rows, max_solutions=1)
+                for zero_rows in small_puzzles] == [found[:1] for found in expected]
+        assert solutions.misses == 0
+        # a puzzle with two solutions stored might have a third
+        several = small_puzzles[0]
+        assert len(solutions.solve(several, max_solutions=3)) == 3
+        assert solutions.misses == 1
+        entry = solutions.get(several)
+        assert entry.max_solutions == 3 and len(entry.solutions) == 3
+        assert entry.nodes > 0
+
+def test_lookup_keeps_the_order(small_puzzles: List[sudoku.Puzzle], tmp_path) -> None:
+    path = os.path.join(str(tmp_path), 'solutions.db')
+    with store.SolutionStore(path) as solutions:
+        stored = small_puzzles[::2]
+        solutions.put_many((zero_rows, store.Entry(sudoku.solve(zero_rows), 1, None, None))
+                           for zero_rows in stored)
+        found = list(solutions.lookup(small_puzzles, chunk=3))
+        assert [zero_rows for zero_rows, _ in found] == small_puzzles
+        assert [entry is not None for _, entry in found] == [
+            index % 2 == 0 for index in range(len(small_puzzles))]
+        assert all(entry.solutions == sudoku.solve(zero_rows)
+                   for zero_rows, entry in found if entry is not None)
+        assert solutions.get([[0] * 9 for _ in range(9)]) is None
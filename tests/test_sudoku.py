@@ -0,0 +1,28 @@
+'''
+test_sudoku.py
+
+The solving entry points of sudoku.py on the puzzles of input.yaml.
+'''
+
+from typing import List
+import canon
+import sudoku
+
+def test_solve_parallel_finds_the_solutions(small_puzzles: List[sudoku.Puzzle]) -> None:
+    for zero_rows in small_puzzles:
+        expected = sudoku.solve(zero_rows, max_solutions=11)
+        if len(expected) > 10:
+            continue
+        count, solution = sudoku.solve_parallel(zero_rows, processes=2, depth=2,
+                                                max_solutions=0)
+        assert count == len(expected)
+        assert (solution in expected) if expected else solution is None
+
+def test_solve_dot_rows_passes_the_options_on(capsys) -> None:
+    dot_rows = ['1.4.', '...3', '2...', '.1.4']
+    cache = canon.SolutionCache()
+    for engine in sorted(sudoku.ENGINES):
+        sudoku.solve_dot_rows(dot_rows, draw=False, engine=engine, cache=cache,
+                              deduce=True)
+        assert capsys.readouterr().out.split() == ['1342', '4213', '2431', '3124']
+    assert (cache.misses, cache.hits) == (1, len(sudoku.ENGINES) - 1)